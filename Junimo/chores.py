@@ -1,10 +1,12 @@
 import discord
 from discord import app_commands
-from discord.ext import tasks
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 import aiohttp
+import asyncio
+import heapq
 import os
+import time
 import aiomysql
 
 # =========================
@@ -24,11 +26,34 @@ ALLOWED_INTERVAL_DAYS = (7, 14, 28)
 CHORE_PING_ROLE_ID = "1332568557313200188"
 CHORE_EMBED_COLOR = 0xFFA4C6
 
+# The chores table is re-read when a chore is added through the bot, and also this often (in seconds)
+# to pick up edits made directly in the database
+CHORE_REFRESH_SECONDS = 3600
+
+# Webhook delivery: how many posts may be in flight at once, how many tries each gets,
+# and how long (in seconds) to wait before retrying a chore that couldn't be delivered
+WEBHOOK_CONCURRENCY = 3
+WEBHOOK_MAX_ATTEMPTS = 5
+WEBHOOK_TIMEOUT_SECONDS = 15
+CHORE_RETRY_SECONDS = 300
+
 # =========================
 # BOT HOOKUP
 # =========================
 bot = None
 
+chores_by_id = {}
+chore_heap = []  # (next post timestamp, chore id)
+chore_refresh = asyncio.Event()
+chore_task = None
+# chore id -> last_posted of a delivered chore whose database update hasn't succeeded yet.
+# Applied on top of every reload so a failed write can never get a chore posted twice.
+unsaved_posts = {}
+
+webhook_session = None
+webhook_semaphore = asyncio.Semaphore(WEBHOOK_CONCURRENCY)
+webhook_ready_at = 0.0  # monotonic time before which the webhook's rate limit bucket is exhausted
+
 
 def set_bot(bot_instance):
     global bot
@@ -66,6 +91,7 @@ def set_bot(bot_instance):
                         (interaction.guild.id, name, description, post_time, interval_days, gif_url),
                     )
 
+            refresh_chores()
             await interaction.followup.send(f"Chore added: {description}")
 
         except ValueError:
@@ -79,10 +105,33 @@ def set_bot(bot_instance):
     #bot.tree.add_command(add_chore)
 
 
-@tasks.loop(minutes=1)
-async def auto_post_chores():
-    now = datetime.now(ZoneInfo(TIMEZONE_NAME))
+def next_post_time(chore: dict) -> datetime:
+    first_post_at = chore["first_post_at"]
+    last_posted = chore["last_posted"]
+
+    if first_post_at and first_post_at.tzinfo is None:
+        first_post_at = first_post_at.replace(tzinfo=ZoneInfo(TIMEZONE_NAME))
+    if last_posted and last_posted.tzinfo is None:
+        last_posted = last_posted.replace(tzinfo=ZoneInfo(TIMEZONE_NAME))
+
+    if last_posted is None:
+        return first_post_at
+    return last_posted + timedelta(days=chore["interval_days"])
+
 
+def schedule_chore(chore: dict):
+    due = next_post_time(chore)
+    if due is None:
+        return
+    heapq.heappush(chore_heap, (due.timestamp(), chore["id"]))
+
+
+def refresh_chores():
+    """Makes the scheduler reload the chores table, e.g. after a chore is added."""
+    chore_refresh.set()
+
+
+async def load_chores():
     async with bot.pool.acquire() as conn:
         async with conn.cursor(aiomysql.DictCursor) as cur:
             await cur.execute(
@@ -93,49 +142,185 @@ async def auto_post_chores():
             )
             chores = await cur.fetchall()
 
+    chores_by_id.clear()
+    chore_heap.clear()
+    for chore in chores:
+        if chore["id"] in unsaved_posts:
+            chore["last_posted"] = unsaved_posts[chore["id"]]
+        chores_by_id[chore["id"]] = chore
+        schedule_chore(chore)
+
+
+def get_webhook_session() -> aiohttp.ClientSession:
+    global webhook_session
+    if webhook_session is None or webhook_session.closed:
+        webhook_session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=WEBHOOK_TIMEOUT_SECONDS))
+    return webhook_session
+
+
+async def close_webhook_session():
+    global webhook_session
+    if webhook_session is not None and not webhook_session.closed:
+        await webhook_session.close()
+    webhook_session = None
+
+
+async def deliver_webhook(webhook_url: str, payload: dict) -> bool:
+    """
+    Posts to the webhook, waiting out Discord's rate limits (Retry-After and the
+    X-RateLimit bucket headers) and retrying server errors. Returns True once delivered.
+    """
+    global webhook_ready_at
+
+    for attempt in range(WEBHOOK_MAX_ATTEMPTS):
+        async with webhook_semaphore:
+            wait = webhook_ready_at - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+            try:
+                async with get_webhook_session().post(webhook_url, json=payload) as response:
+                    headers = response.headers
+                    if headers.get("X-RateLimit-Remaining") == "0":
+                        reset_after = float(headers.get("X-RateLimit-Reset-After", 1))
+                        webhook_ready_at = max(webhook_ready_at, time.monotonic() + reset_after)
+
+                    if 200 <= response.status < 300:
+                        return True
+
+                    if response.status == 429:
+                        retry_after = headers.get("Retry-After")
+                        if retry_after is None:
+                            data = await response.json(content_type=None)
+                            retry_after = data.get("retry_after", 1)
+                        webhook_ready_at = max(webhook_ready_at, time.monotonic() + float(retry_after))
+                        continue
+
+                    if response.status < 500:
+                        print(f"Chore webhook rejected ({response.status}): {await response.text()}")
+                        return False
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"Chore webhook request failed: {e}")
+
+        # Server error or network failure: back off before the next attempt
+        await asyncio.sleep(2 ** attempt)
+
+    return False
+
+
+def chore_payload(chore: dict) -> dict:
+    embed = {
+        "title": chore["name"],
+        "description": chore["description"],
+        "color": CHORE_EMBED_COLOR,
+    }
+    if chore["gif_url"]:
+        embed["image"] = {"url": chore["gif_url"]}
+
+    return {
+        "content": f"<@&{CHORE_PING_ROLE_ID}>",
+        "embeds": [embed],
+        "allowed_mentions": {"roles": [CHORE_PING_ROLE_ID]},
+    }
+
+
+async def post_due_chores():
+    now = datetime.now(ZoneInfo(TIMEZONE_NAME))
+
+    due_chores = []
+    while chore_heap and chore_heap[0][0] <= now.timestamp():
+        _, chore_id = heapq.heappop(chore_heap)
+        chore = chores_by_id.get(chore_id)
+        if chore and chore not in due_chores:
+            due_chores.append(chore)
+
+    if not due_chores:
+        return
+
     webhook_url = os.getenv(WEBHOOK_ENV_VAR)
     if not webhook_url:
         print(f"{WEBHOOK_ENV_VAR} not found.")
+        # Try again later instead of spinning on the same chores
+        for chore in due_chores:
+            heapq.heappush(chore_heap, (time.time() + CHORE_RETRY_SECONDS, chore["id"]))
         return
 
-    async with aiohttp.ClientSession() as session:
-        for chore in chores:
-            first_post_at = chore["first_post_at"]
-            last_posted = chore["last_posted"]
-            interval = chore["interval_days"]
-
-            if first_post_at and first_post_at.tzinfo is None:
-                first_post_at = first_post_at.replace(tzinfo=ZoneInfo(TIMEZONE_NAME))
-            if last_posted and last_posted.tzinfo is None:
-                last_posted = last_posted.replace(tzinfo=ZoneInfo(TIMEZONE_NAME))
-
-            if last_posted is None:
-                if now < first_post_at:
-                    continue
-            else:
-                next_post = last_posted + timedelta(days=interval)
-                if now < next_post:
-                    continue
-
-            embed = {
-                "title": chore["name"],
-                "description": chore["description"],
-                "color": CHORE_EMBED_COLOR,
-            }
-            if chore["gif_url"]:
-                embed["image"] = {"url": chore["gif_url"]}
-
-            payload = {
-                "content": f"<@&{CHORE_PING_ROLE_ID}>",
-                "embeds": [embed],
-                "allowed_mentions": {"roles": [CHORE_PING_ROLE_ID]},
-            }
-
-            await session.post(webhook_url, json=payload)
-            
-            async with bot.pool.acquire() as conn:
-                async with conn.cursor() as cur:
-                    await cur.execute(
-                        "UPDATE chores SET last_posted = %s WHERE id = %s",
-                        (now, chore["id"]),
-                    )
+    results = await asyncio.gather(
+        *(deliver_webhook(webhook_url, chore_payload(chore)) for chore in due_chores)
+    )
+
+    posted = [chore for chore, ok in zip(due_chores, results) if ok]
+    for chore, ok in zip(due_chores, results):
+        if not ok:
+            # Not marked as posted, so it's retried later rather than skipped
+            heapq.heappush(chore_heap, (time.time() + CHORE_RETRY_SECONDS, chore["id"]))
+
+    # Delivered chores are rescheduled in memory first, so they can't come due again
+    # even if writing last_posted to the database fails
+    for chore in posted:
+        chore["last_posted"] = now
+        unsaved_posts[chore["id"]] = now
+        schedule_chore(chore)
+
+    await save_posted_chores()
+
+
+async def save_posted_chores():
+    """Writes last_posted for delivered chores, one statement per post time. Failed writes stay in unsaved_posts."""
+    by_time = {}
+    for chore_id, posted_at in unsaved_posts.items():
+        by_time.setdefault(posted_at, []).append(chore_id)
+
+    for posted_at, chore_ids in by_time.items():
+        placeholders = ", ".join(["%s"] * len(chore_ids))
+        async with bot.pool.acquire() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    f"UPDATE chores SET last_posted = %s WHERE id IN ({placeholders})",
+                    (posted_at, *chore_ids),
+                )
+        for chore_id in chore_ids:
+            if unsaved_posts.get(chore_id) == posted_at:
+                del unsaved_posts[chore_id]
+
+
+async def run_chore_scheduler():
+    """Sleeps until the next chore is due instead of checking every chore every minute."""
+    await bot.wait_until_ready()
+    next_refresh = 0.0
+
+    while True:
+        if chore_refresh.is_set() or time.monotonic() >= next_refresh:
+            chore_refresh.clear()
+            try:
+                await load_chores()
+            except Exception as e:
+                print("ERROR loading chores:", e)
+            next_refresh = time.monotonic() + CHORE_REFRESH_SECONDS
+
+        try:
+            if unsaved_posts:
+                await save_posted_chores()
+        except Exception as e:
+            print("ERROR saving posted chores:", e)
+
+        try:
+            await post_due_chores()
+        except Exception as e:
+            print("ERROR posting chores:", e)
+
+        timeout = next_refresh - time.monotonic()
+        if chore_heap:
+            timeout = min(timeout, chore_heap[0][0] - time.time())
+        if unsaved_posts:
+            timeout = min(timeout, CHORE_RETRY_SECONDS)
+        try:
+            await asyncio.wait_for(chore_refresh.wait(), timeout=max(0, timeout))
+        except asyncio.TimeoutError:
+            pass
+
+
+def start_chore_scheduler():
+    global chore_task
+    if chore_task is None or chore_task.done():
+        chore_task = asyncio.create_task(run_chore_scheduler())
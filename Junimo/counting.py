@@ -1,7 +1,10 @@
 import discord
+from discord.ext import tasks
 import asyncio
 import json
 import os
+import threading
+from expiry import schedule_role_removal
 
 # =========================
 # CONFIGURATION
@@ -13,6 +16,8 @@ LOSER_ROLE_ID = 1332969280165384254
 LOSER_ROLE_DURATION = 300 
 
 DATA_FILE = "counting_data.json"
+# How often (in seconds) changes to the count are written to DATA_FILE
+SAVE_INTERVAL_SECONDS = 5
 
 MILESTONES = [
     10, 50, 100, 150, 200, 250, 300, 350, 400, 500,
@@ -33,6 +38,13 @@ TRIGGER_BYPASS_MESSAGE = "!zliwpj"
 bot = None
 current_count = 0
 last_user_id = None
+count_dirty = False
+# Writes to DATA_FILE can come from the flush task's thread and from shutdown at the same time.
+# They're serialized, and a snapshot older than the one already on disk is never written.
+count_file_lock = threading.Lock()
+count_snapshot_version = 0
+count_written_version = 0
+counting_queues = {}  # channel_id -> asyncio.Queue of (message, outcome, value)
 
 
 def load_count_data():
@@ -50,40 +62,123 @@ def load_count_data():
             print(f"Warning: {DATA_FILE} is empty or invalid. Resetting count.")
             current_count = 0
             last_user_id = None
-            save_count_data()
+            flush_count_data_now()
     else:
         current_count = 0
         last_user_id = None
-        save_count_data()
+        flush_count_data_now()
+
+
+def snapshot_count_data() -> tuple:
+    global count_snapshot_version
+    count_snapshot_version += 1
+    return count_snapshot_version, {"current_count": current_count, "last_user_id": last_user_id}
+
+
+def write_count_file(version: int, data: dict):
+    global count_written_version
+    with count_file_lock:
+        if version < count_written_version:
+            return
+        # Write to a temp file and rename over DATA_FILE so a crash mid-write never leaves a half-written file
+        tmp_path = f"{DATA_FILE}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, DATA_FILE)
+        count_written_version = version
 
 
 def save_count_data():
-    with open(DATA_FILE, "w") as f:
-        json.dump({"current_count": current_count, "last_user_id": last_user_id}, f)
+    """Marks the count as changed. It's written to disk by flush_count_data, not here."""
+    global count_dirty
+    count_dirty = True
 
 
-async def counting_on_message(message: discord.Message):
-    global current_count, last_user_id
+def flush_count_data_now():
+    """Writes the count synchronously, used at startup and shutdown."""
+    global count_dirty
+    count_dirty = False
+    write_count_file(*snapshot_count_data())
 
-    if message.author.bot or message.channel.id != COUNTING_CHANNEL_ID:
+
+@tasks.loop(seconds=SAVE_INTERVAL_SECONDS)
+async def flush_count_data():
+    global count_dirty
+    if not count_dirty:
         return
 
-    guild = message.guild
-    loser_role = guild.get_role(LOSER_ROLE_ID)
+    count_dirty = False
+    try:
+        await asyncio.to_thread(write_count_file, *snapshot_count_data())
+    except OSError as e:
+        print(f"Warning: could not save {DATA_FILE}: {e}")
+        count_dirty = True
+
+
+def judge_count(author_id: int, content: str):
+    """
+    Validates a counting message against the current state and applies the state change.
+    Never awaits, so no other message can be judged in between. Returns (outcome, value) where
+    outcome is "invalid", "correct" (value = the new count) or "reset" (value = the count that was lost).
+    """
+    global current_count, last_user_id
 
-    # Parse number
     try:
-        number = int(message.content.strip())
+        number = int(content.strip())
     except ValueError:
-        await message.delete()
-        return
+        return "invalid", None
 
-    # Correct count
-    if number == current_count + 1 and message.author.id != last_user_id:
+    if number == current_count + 1 and author_id != last_user_id:
         current_count = number
-        last_user_id = message.author.id
+        last_user_id = author_id
         save_count_data()
+        return "correct", number
+
+    lost_count = current_count
+    current_count = 0
+    last_user_id = None
+    save_count_data()
+    return "reset", lost_count
 
+
+async def counting_on_message(message: discord.Message):
+    if message.author.bot or message.channel.id != COUNTING_CHANNEL_ID:
+        return
+
+    outcome, value = judge_count(message.author.id, message.content)
+
+    # Discord side effects run in order per channel, off the validation path
+    queue = counting_queues.get(message.channel.id)
+    if queue is None:
+        queue = counting_queues[message.channel.id] = asyncio.Queue()
+        asyncio.create_task(process_counting_queue(queue))
+    queue.put_nowait((message, outcome, value))
+
+
+async def process_counting_queue(queue: asyncio.Queue):
+    while True:
+        message, outcome, value = await queue.get()
+        try:
+            await apply_count_outcome(message, outcome, value)
+        except Exception as e:
+            # Anything escaping here would end the worker and silently stop all later side effects
+            print(f"Warning: counting side effects failed for message {message.id}: {e}")
+        finally:
+            queue.task_done()
+
+
+async def apply_count_outcome(message: discord.Message, outcome: str, number: int):
+    if outcome == "invalid":
+        try:
+            await message.delete()
+        except discord.NotFound:
+            pass
+        return
+
+    # Correct count
+    if outcome == "correct":
         if number in FUNNY_NUMBERS:
             embed = discord.Embed(
                 title=f"Funny Number: {number}",
@@ -122,26 +217,27 @@ async def counting_on_message(message: discord.Message):
 
     # Wrong count → reset
     else:
-        await message.delete()
+        loser_role = message.guild.get_role(LOSER_ROLE_ID)
+        loser_role_text = loser_role.mention if loser_role else "loser"
+
+        try:
+            await message.delete()
+        except discord.NotFound:
+            pass
 
         embed = discord.Embed(
             title="Counting Reset",
             description=(
-                f"{message.author.mention} messed up the count at **{current_count}** and has been given the "
-                f"{loser_role.mention} role! The count has been reset to **0**."
+                f"{message.author.mention} messed up the count at **{number}** and has been given the "
+                f"{loser_role_text} role! The count has been reset to **0**."
             ),
             color=discord.Color.from_str(EMBED_COLOR),
         )
         await message.channel.send(embed=embed)
 
-        current_count = 0
-        last_user_id = None
-        save_count_data()
-
         if loser_role:
             await message.author.add_roles(loser_role)
-            await asyncio.sleep(LOSER_ROLE_DURATION)
-            await message.author.remove_roles(loser_role)
+            await schedule_role_removal(message.author, loser_role, LOSER_ROLE_DURATION)
 
 
 def set_bot(bot_instance):
@@ -0,0 +1,165 @@
+import discord
+import asyncio
+import heapq
+import time
+import aiomysql
+
+# ==================================
+# ROLE EXPIRY SCHEDULER
+# ==================================
+# Timed roles (like the counting loser role) are stored in the role_expiries table and removed by a
+# single background task, so pending expiries survive restarts and don't each hold a coroutine.
+#
+# CREATE TABLE role_expiries (
+#     id INT AUTO_INCREMENT PRIMARY KEY,
+#     guild_id BIGINT NOT NULL,
+#     user_id BIGINT NOT NULL,
+#     role_id BIGINT NOT NULL,
+#     expires_at BIGINT NOT NULL,
+#     owner VARCHAR(32) NOT NULL,
+#     UNIQUE KEY uniq_role_expiry (owner, guild_id, user_id, role_id)
+# );
+#
+# The table is shared by Junimo and Junisheriff. Each bot only loads, replaces and deletes the
+# rows it owns; otherwise one bot would hold a stale copy of the other's expiries in memory.
+
+# Name this bot's rows are stored under
+EXPIRY_OWNER = "junimo"
+
+# How long to wait before retrying when the pending expiries can't be loaded
+EXPIRY_RETRY_SECONDS = 60
+
+bot = None
+
+expiry_heap = []  # (expires_at, expiry_id)
+pending_expiries = {}  # expiry_id -> (guild_id, user_id, role_id, expires_at)
+expiry_wakeup = None
+expiry_task = None
+
+
+def set_bot(bot_instance):
+    global bot
+    bot = bot_instance
+
+
+async def schedule_role_removal(member: discord.Member, role: discord.Role, seconds: int):
+    """Removes role from member after the given number of seconds, replacing any earlier expiry for that role."""
+    expires_at = int(time.time()) + seconds
+
+    async with bot.pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                INSERT INTO role_expiries (guild_id, user_id, role_id, expires_at, owner)
+                VALUES (%s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id), expires_at = VALUES(expires_at)
+                """,
+                (member.guild.id, member.id, role.id, expires_at, EXPIRY_OWNER),
+            )
+            expiry_id = cur.lastrowid
+
+    add_pending(expiry_id, member.guild.id, member.id, role.id, expires_at)
+
+
+async def cancel_role_removal(guild_id: int, user_id: int, role_id: int):
+    """Forgets a pending expiry, e.g. when the role was removed by hand."""
+    async with bot.pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                "DELETE FROM role_expiries WHERE guild_id = %s AND user_id = %s AND role_id = %s AND owner = %s",
+                (guild_id, user_id, role_id, EXPIRY_OWNER),
+            )
+
+    for expiry_id, (g, u, r, _) in list(pending_expiries.items()):
+        if (g, u, r) == (guild_id, user_id, role_id):
+            del pending_expiries[expiry_id]
+
+
+def add_pending(expiry_id: int, guild_id: int, user_id: int, role_id: int, expires_at: int):
+    # Stale heap entries (replaced or cancelled) are skipped when popped
+    pending_expiries[expiry_id] = (guild_id, user_id, role_id, expires_at)
+    heapq.heappush(expiry_heap, (expires_at, expiry_id))
+    if expiry_wakeup is not None:
+        expiry_wakeup.set()
+
+
+async def load_pending_expiries():
+    async with bot.pool.acquire() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cur:
+            await cur.execute(
+                "SELECT id, guild_id, user_id, role_id, expires_at FROM role_expiries WHERE owner = %s",
+                (EXPIRY_OWNER,),
+            )
+            rows = await cur.fetchall()
+
+    for row in rows:
+        add_pending(row["id"], row["guild_id"], row["user_id"], row["role_id"], row["expires_at"])
+
+
+async def expire_role(expiry_id: int, guild_id: int, user_id: int, role_id: int):
+    guild = bot.get_guild(guild_id)
+    if guild:
+        role = guild.get_role(role_id)
+        member = guild.get_member(user_id)
+        if member is None:
+            try:
+                member = await guild.fetch_member(user_id)
+            except discord.NotFound:
+                member = None
+
+        if role and member and role in member.roles:
+            await member.remove_roles(role, reason="Timed role expired")
+
+    async with bot.pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                "DELETE FROM role_expiries WHERE id = %s AND owner = %s AND expires_at <= %s",
+                (expiry_id, EXPIRY_OWNER, int(time.time())),
+            )
+
+
+async def run_expiry_scheduler():
+    global expiry_wakeup
+    expiry_wakeup = asyncio.Event()
+
+    await bot.wait_until_ready()
+    loaded = False
+
+    while True:
+        expiry_wakeup.clear()
+
+        if not loaded:
+            # Expiries scheduled meanwhile are still handled; the rest are picked up once the load works
+            try:
+                await load_pending_expiries()
+                loaded = True
+            except Exception as e:
+                print(f"Warning: Failed to load pending expiries, retrying in {EXPIRY_RETRY_SECONDS}s: {e}")
+
+        now = time.time()
+        while expiry_heap and expiry_heap[0][0] <= now:
+            expires_at, expiry_id = heapq.heappop(expiry_heap)
+            entry = pending_expiries.get(expiry_id)
+            if entry is None or entry[3] != expires_at:
+                continue
+
+            del pending_expiries[expiry_id]
+            guild_id, user_id, role_id, _ = entry
+            try:
+                await expire_role(expiry_id, guild_id, user_id, role_id)
+            except Exception as e:
+                print(f"Warning: Failed to remove role {role_id} from {user_id}: {e}")
+
+        timeout = expiry_heap[0][0] - time.time() if expiry_heap else None
+        if not loaded:
+            timeout = EXPIRY_RETRY_SECONDS if timeout is None else min(timeout, EXPIRY_RETRY_SECONDS)
+        try:
+            await asyncio.wait_for(expiry_wakeup.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+def start_expiry_scheduler():
+    global expiry_task
+    if expiry_task is None or expiry_task.done():
+        expiry_task = asyncio.create_task(run_expiry_scheduler())
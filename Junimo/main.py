@@ -7,12 +7,13 @@ from discord.ext import commands
 import aiomysql
 import urllib.parse
 
-from qotd import qotd_group, auto_post_qotd, set_bot as set_qotd_bot
-from chores import set_bot as set_chores_bot, auto_post_chores
+from qotd import qotd_group, start_qotd_scheduler, set_bot as set_qotd_bot
+from chores import set_bot as set_chores_bot, start_chore_scheduler, close_webhook_session
 from uwu import set_bot as set_uwu_bot, uwu
 from triggers import set_bot as set_trigger_bot
-from starboard import setup_starboard
-from counting import set_bot as set_count_bot
+from starboard import setup_starboard, start_stats_reports
+from counting import set_bot as set_count_bot, flush_count_data, flush_count_data_now
+from expiry import set_bot as set_expiry_bot, start_expiry_scheduler
 
 class Client(commands.Bot):
     def __init__(self, **kwargs):
@@ -35,14 +36,27 @@ class Client(commands.Bot):
         self.tree.add_command(uwu)
         await self.tree.sync()
         setup_starboard(self)
+        start_stats_reports()
+        start_expiry_scheduler()
 
     async def on_ready(self):
         print(f'Logged on as {self.user}')
-        if not auto_post_qotd.is_running():
-            auto_post_qotd.start()
-        
-        if not auto_post_chores.is_running():
-            auto_post_chores.start()
+        start_qotd_scheduler()
+        start_chore_scheduler()
+
+        if not flush_count_data.is_running():
+            flush_count_data.start()
+
+    async def close(self):
+        try:
+            flush_count_data.cancel()
+            try:
+                flush_count_data_now()
+            except OSError as e:
+                print(f"Warning: could not save the count on shutdown: {e}")
+            await close_webhook_session()
+        finally:
+            await super().close()
 
 intents = discord.Intents.default()
 intents.message_content = True
@@ -55,5 +69,6 @@ set_chores_bot(bot)
 set_uwu_bot(bot)
 set_trigger_bot(bot)
 set_count_bot(bot)
+set_expiry_bot(bot)
 
 bot.run(os.getenv("DISCORD_TOKEN"))
@@ -1,9 +1,11 @@
 import discord
-from discord.ext import tasks
 from discord import app_commands, ui
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from zoneinfo import ZoneInfo
 import aiomysql
+import asyncio
+import secrets
+import re
 
 # =========================
 # CONFIGURATION
@@ -15,17 +17,25 @@ QOTD_ROLE_ID = 1322427477053669406
 TIMEZONE_NAME = "America/Chicago" 
 AUTO_POST_HOUR = 15          
 AUTO_POST_MINUTE = 20      
+# If the bot was down at post time, the missed QOTD is posted at startup if it's within this many hours
+CATCH_UP_WINDOW_HOURS = 6
 
 THREAD_NAME = "Answers"
 THREAD_AUTO_ARCHIVE_MINUTES = 1440
 
 EMBED_COLOR = "#9CEC61"
 QUEUE_PAGE_SIZE = 10
+# How long (in seconds) the buttons on a /qotd view message keep working
+QUEUE_VIEW_TIMEOUT_SECONDS = 300
+# Most QOTDs /qotd delete_many can remove in one go
+BULK_DELETE_MAX = 100
 
 # =========================
 # BOT HOOKUP
 # =========================
 bot = None
+qotd_task = None
+queue_counts = {}  # guild_id -> unpublished QOTDs left
 
 
 def set_bot(bot_instance):
@@ -33,88 +43,141 @@ def set_bot(bot_instance):
     bot = bot_instance
 
 
-class Pages(ui.View):
-    def __init__(self, embeds):
-        super().__init__(timeout=None)
-        self.embeds = embeds
+class QueuePages(ui.View):
+    """
+    Pages through a guild's QOTD queue one page at a time, fetching each page with a keyset
+    query on id when it's shown instead of loading the whole queue up front.
+    """
+
+    def __init__(self, guild_id: int):
+        super().__init__(timeout=QUEUE_VIEW_TIMEOUT_SECONDS)
+        self.guild_id = guild_id
         self.current_page = 0
+        # page_cursors[i] is the id that page i starts after
+        self.page_cursors = [0]
+        self.has_next = False
+        self.total = 0
+
+    async def fetch_page(self) -> list:
+        async with bot.pool.acquire() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cur:
+                await cur.execute(
+                    """
+                    SELECT id, question FROM qotds
+                    WHERE guild_id = %s AND is_published = FALSE AND id > %s
+                    ORDER BY id ASC
+                    LIMIT %s
+                    """,
+                    (self.guild_id, self.page_cursors[self.current_page], QUEUE_PAGE_SIZE + 1),
+                )
+                rows = await cur.fetchall()
+                self.total = await get_queue_count(cur, self.guild_id)
+
+        # The extra row only tells us whether there's a next page
+        self.has_next = len(rows) > QUEUE_PAGE_SIZE
+        rows = rows[:QUEUE_PAGE_SIZE]
+        if rows and len(self.page_cursors) == self.current_page + 1:
+            self.page_cursors.append(rows[-1]["id"])
+        return rows
+
+    async def render(self):
+        """Returns the embed for the current page, or None if the queue is empty."""
+        rows = await self.fetch_page()
+        if not rows:
+            return None
+
+        start = self.current_page * QUEUE_PAGE_SIZE + 1
+        description = "\n".join(
+            f"**{idx}.** {entry['question']}"
+            for idx, entry in enumerate(rows, start=start)
+        )
+        embed = discord.Embed(title="Question of the Day Queue", description=description)
+        total_pages = max(1, (self.total - 1) // QUEUE_PAGE_SIZE + 1)
+        embed.set_footer(text=f"Page {self.current_page + 1}/{max(total_pages, self.current_page + 1)}")
+
         self.update_buttons()
+        return embed
 
     def update_buttons(self):
         self.children[0].disabled = self.current_page == 0
-        self.children[1].disabled = self.current_page == len(self.embeds) - 1
+        self.children[1].disabled = not self.has_next
+
+    async def show(self, interaction: discord.Interaction):
+        embed = await self.render()
+        if embed is None:
+            # The queue shrank since the page was first shown
+            await interaction.response.edit_message(content="QOTD queue empty, fill her up~", embed=None, view=None)
+            return
+        await interaction.response.edit_message(embed=embed, view=self)
 
     @ui.button(label="Previous", style=discord.ButtonStyle.primary)
     async def previous_page(self, interaction: discord.Interaction, button: ui.Button):
         if self.current_page > 0:
             self.current_page -= 1
-            self.update_buttons()
-            await interaction.response.edit_message(embed=self.embeds[self.current_page], view=self)
+            await self.show(interaction)
 
     @ui.button(label="Next", style=discord.ButtonStyle.primary)
     async def next_page(self, interaction: discord.Interaction, button: ui.Button):
-        if self.current_page < len(self.embeds) - 1:
+        if self.has_next:
             self.current_page += 1
-            self.update_buttons()
-            await interaction.response.edit_message(embed=self.embeds[self.current_page], view=self)
-
-
-class QOTDGroup(app_commands.Group):
-    def __init__(self):
-        super().__init__(name="qotd", description="Manage QOTDs")
-
-
-qotd_group = QOTDGroup()
+            await self.show(interaction)
+
+
+async def get_queue_count(cur, guild_id: int) -> int:
+    """Unpublished QOTDs left for a guild, counted once and then kept up to date in memory."""
+    if guild_id not in queue_counts:
+        await cur.execute(
+            """
+            SELECT COUNT(*) AS count FROM qotds
+            WHERE guild_id = %s AND is_published = FALSE
+            """,
+            (guild_id,),
+        )
+        queue_counts[guild_id] = (await cur.fetchone())["count"]
+    return queue_counts[guild_id]
 
 
-@qotd_group.command(name="add", description="Adds a QOTD to the queue")
-async def add_qotd(interaction: discord.Interaction, question: str, image: discord.Attachment = None):
-    async with bot.pool.acquire() as conn:
-        async with conn.cursor() as cur:
-            await cur.execute(
-                """
-                INSERT INTO qotds (guild_id, question, author, is_published, image_url)
-                VALUES (%s, %s, %s, FALSE, %s)
-                """,
-                (interaction.guild.id, question, interaction.user.name, image.url if image else None),
-            )
-    await interaction.response.send_message(f"Submitted QOTD: {question}", ephemeral=True)
+def adjust_queue_count(guild_id: int, delta: int):
+    if guild_id in queue_counts:
+        queue_counts[guild_id] = max(0, queue_counts[guild_id] + delta)
 
 
-@qotd_group.command(name="post", description="Manually post QOTD to the QOTD channel and create a thread")
-async def post_qotd(interaction: discord.Interaction):
-    channel = interaction.guild.get_channel(QOTD_CHANNEL_ID)
-    if not channel:
-        await interaction.response.send_message("QOTD channel not found.", ephemeral=True)
-        return
+async def dequeue_qotd(guild_id: int):
+    """
+    Atomically claims the oldest unpublished QOTD. The claim happens in a single UPDATE, so two
+    posts running at once can never publish the same question. Returns (record, remaining) or (None, 0).
+    """
+    claim_token = secrets.token_hex(16)
 
     async with bot.pool.acquire() as conn:
         async with conn.cursor(aiomysql.DictCursor) as cur:
             await cur.execute(
                 """
-                SELECT * FROM qotds
+                UPDATE qotds
+                SET is_published = TRUE, published_at = UTC_TIMESTAMP(), claim_token = %s
                 WHERE guild_id = %s AND is_published = FALSE
                 ORDER BY id ASC
                 LIMIT 1
                 """,
-                (interaction.guild.id,),
+                (claim_token, guild_id),
             )
-            record = await cur.fetchone()
-            if not record:
-                await interaction.response.send_message("No QOTD in queue, slut", ephemeral=True)
-                return
-
-            await cur.execute("UPDATE qotds SET is_published = TRUE WHERE id = %s", (record["id"],))
+            if cur.rowcount == 0:
+                queue_counts[guild_id] = 0
+                return None, 0
 
             await cur.execute(
-                """
-                SELECT COUNT(*) AS count FROM qotds
-                WHERE guild_id = %s AND is_published = FALSE
-                """,
-                (interaction.guild.id,),
+                "SELECT id, question, author, image_url FROM qotds WHERE claim_token = %s",
+                (claim_token,),
             )
-            count = (await cur.fetchone())["count"]
+            record = await cur.fetchone()
+
+            adjust_queue_count(guild_id, -1)
+            count = await get_queue_count(cur, guild_id)
+
+    return record, count
 
+
+async def send_qotd(channel: discord.TextChannel, record: dict, count: int) -> discord.Message:
     embed = discord.Embed(
         title="Question of the Day",
         description=record["question"],
@@ -124,71 +187,92 @@ async def post_qotd(interaction: discord.Interaction):
         embed.set_image(url=record["image_url"])
     embed.set_footer(text=f"| Author: {record['author']} | {count} QOTDs left in queue |")
 
-    message = await channel.send(
+    return await channel.send(
         content=f"<@&{QOTD_ROLE_ID}>",
         embed=embed,
         allowed_mentions=discord.AllowedMentions(roles=True),
     )
 
-    await interaction.response.send_message("QOTD posted and thread created.", ephemeral=True)
-    await message.create_thread(name=THREAD_NAME, auto_archive_duration=THREAD_AUTO_ARCHIVE_MINUTES)
 
+class QOTDGroup(app_commands.Group):
+    def __init__(self):
+        super().__init__(name="qotd", description="Manage QOTDs")
 
-@qotd_group.command(name="view", description="View the list of upcoming QOTDs")
-async def view_queue(interaction: discord.Interaction):
+
+qotd_group = QOTDGroup()
+
+
+@qotd_group.command(name="add", description="Adds a QOTD to the queue")
+async def add_qotd(interaction: discord.Interaction, question: str, image: discord.Attachment = None):
     async with bot.pool.acquire() as conn:
-        async with conn.cursor(aiomysql.DictCursor) as cur:
+        async with conn.cursor() as cur:
             await cur.execute(
                 """
-                SELECT * FROM qotds
-                WHERE guild_id = %s AND is_published = FALSE
-                ORDER BY id ASC
+                INSERT INTO qotds (guild_id, question, author, is_published, image_url)
+                VALUES (%s, %s, %s, FALSE, %s)
                 """,
-                (interaction.guild.id,),
+                (interaction.guild.id, question, interaction.user.name, image.url if image else None),
             )
-            records = await cur.fetchall()
+    adjust_queue_count(interaction.guild.id, 1)
+    await interaction.response.send_message(f"Submitted QOTD: {question}", ephemeral=True)
 
-    if not records:
-        await interaction.response.send_message("QOTD queue empty, fill her up~", ephemeral=True)
+
+@qotd_group.command(name="post", description="Manually post QOTD to the QOTD channel and create a thread")
+async def post_qotd(interaction: discord.Interaction):
+    channel = interaction.guild.get_channel(QOTD_CHANNEL_ID)
+    if not channel:
+        await interaction.response.send_message("QOTD channel not found.", ephemeral=True)
         return
 
-    pages = []
-    for i in range(0, len(records), QUEUE_PAGE_SIZE):
-        chunk = records[i : i + QUEUE_PAGE_SIZE]
-        description = "\n".join(
-            f"**{idx}.** {entry['question']}"
-            for idx, entry in enumerate(chunk, start=i + 1)
-        )
-        embed = discord.Embed(title="Question of the Day Queue", description=description)
-        embed.set_footer(
-            text=f"Page {i // QUEUE_PAGE_SIZE + 1}/{(len(records) - 1) // QUEUE_PAGE_SIZE + 1}"
-        )
-        pages.append(embed)
+    record, count = await dequeue_qotd(interaction.guild.id)
+    if not record:
+        await interaction.response.send_message("No QOTD in queue, slut", ephemeral=True)
+        return
+
+    message = await send_qotd(channel, record, count)
+
+    await interaction.response.send_message("QOTD posted and thread created.", ephemeral=True)
+    await message.create_thread(name=THREAD_NAME, auto_archive_duration=THREAD_AUTO_ARCHIVE_MINUTES)
+
+
+@qotd_group.command(name="view", description="View the list of upcoming QOTDs")
+async def view_queue(interaction: discord.Interaction):
+    view = QueuePages(interaction.guild.id)
+    embed = await view.render()
+
+    if embed is None:
+        await interaction.response.send_message("QOTD queue empty, fill her up~", ephemeral=True)
+        return
 
-    view = Pages(pages)
-    await interaction.response.send_message(embed=pages[0], view=view, ephemeral=True)
+    await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
 
 
 @qotd_group.command(name="delete", description="Deletes a QOTD by index")
 async def delete_qotd(interaction: discord.Interaction, index: int):
+    if index < 1:
+        await interaction.response.send_message("Index invalid", ephemeral=True)
+        return
+
     async with bot.pool.acquire() as conn:
         async with conn.cursor(aiomysql.DictCursor) as cur:
+            # The (guild_id, is_published, id) index lets MySQL find the row at this position directly
             await cur.execute(
                 """
                 SELECT id, question, author FROM qotds
                 WHERE guild_id = %s AND is_published = FALSE
                 ORDER BY id ASC
+                LIMIT 1 OFFSET %s
                 """,
-                (interaction.guild.id,),
+                (interaction.guild.id, index - 1),
             )
-            records = await cur.fetchall()
+            target = await cur.fetchone()
 
-            if index < 1 or index > len(records):
+            if not target:
                 await interaction.response.send_message("Index invalid", ephemeral=True)
                 return
 
-            target = records[index - 1]
-            await cur.execute("DELETE FROM qotds WHERE id = %s", (target["id"],))
+            await cur.execute("DELETE FROM qotds WHERE id = %s AND is_published = FALSE", (target["id"],))
+            adjust_queue_count(interaction.guild.id, -cur.rowcount)
 
     await interaction.response.send_message(
         f'Removed QOTD #{index}: "{target["question"]}" by {target["author"]}',
@@ -196,55 +280,190 @@ async def delete_qotd(interaction: discord.Interaction, index: int):
     )
 
 
-@tasks.loop(minutes=1)
-async def auto_post_qotd():
-    now = datetime.now(ZoneInfo(TIMEZONE_NAME))
-    if now.hour != AUTO_POST_HOUR or now.minute != AUTO_POST_MINUTE:
+def parse_indices(indices: str) -> list:
+    """Parses queue positions like "3", "1, 4, 7" or "2-5" (or a mix) into a sorted list."""
+    positions = set()
+    for part in indices.replace(" ", "").split(","):
+        if not part:
+            continue
+        match = re.fullmatch(r"(\d+)(?:-(\d+))?", part)
+        if not match:
+            raise ValueError(f"`{part}` isn't an index or a range like 2-5.")
+        start = int(match.group(1))
+        end = int(match.group(2) or start)
+        if start < 1 or end < start:
+            raise ValueError(f"`{part}` isn't a valid index or range.")
+        if len(positions) + end - start + 1 > BULK_DELETE_MAX:
+            raise ValueError(f"You can delete at most {BULK_DELETE_MAX} QOTDs at once.")
+        positions.update(range(start, end + 1))
+
+    if not positions:
+        raise ValueError("No indices given.")
+    return sorted(positions)
+
+
+@qotd_group.command(name="delete_many", description="Deletes several QOTDs by index, e.g. 1, 4, 7-10")
+async def delete_many_qotd(interaction: discord.Interaction, indices: str):
+    try:
+        positions = parse_indices(indices)
+    except ValueError as e:
+        await interaction.response.send_message(str(e), ephemeral=True)
         return
 
-    for guild in bot.guilds:
-        qotd_channel = guild.get_channel(QOTD_CHANNEL_ID)
-        if not qotd_channel:
-            continue
+    placeholders = ", ".join(["%s"] * len(positions))
 
-        async with bot.pool.acquire() as conn:
+    async with bot.pool.acquire() as conn:
+        await conn.begin()
+        try:
             async with conn.cursor(aiomysql.DictCursor) as cur:
+                # Positions are resolved server-side, so only the rows being deleted are sent back
                 await cur.execute(
-                    """
-                    SELECT * FROM qotds
-                    WHERE guild_id = %s AND is_published = FALSE
-                    ORDER BY id ASC
-                    LIMIT 1
+                    f"""
+                    SELECT id, pos, question FROM (
+                        SELECT id, question, ROW_NUMBER() OVER (ORDER BY id) AS pos
+                        FROM qotds
+                        WHERE guild_id = %s AND is_published = FALSE
+                    ) AS queue
+                    WHERE pos IN ({placeholders})
                     """,
-                    (guild.id,),
+                    (interaction.guild.id, *positions),
                 )
-                record = await cur.fetchone()
-                if not record:
-                    continue
+                targets = await cur.fetchall()
+
+                if targets:
+                    ids = [target["id"] for target in targets]
+                    await cur.execute(
+                        f"DELETE FROM qotds WHERE id IN ({', '.join(['%s'] * len(ids))}) AND is_published = FALSE",
+                        ids,
+                    )
+                    deleted = cur.rowcount
+            await conn.commit()
+        except Exception:
+            await conn.rollback()
+            raise
+
+    if not targets:
+        await interaction.response.send_message("Index invalid", ephemeral=True)
+        return
 
-                await cur.execute("UPDATE qotds SET is_published = TRUE WHERE id = %s", (record["id"],))
+    adjust_queue_count(interaction.guild.id, -deleted)
+
+    lines = [f'**{target["pos"]}.** {target["question"]}' for target in targets]
+    missing = len(positions) - len(targets)
+    if missing:
+        lines.append(f"({missing} index(es) were past the end of the queue)")
+
+    message = f"Removed {len(targets)} QOTDs:\n" + "\n".join(lines)
+    if len(message) > 2000:
+        message = message[:1997] + "..."
+    await interaction.response.send_message(message, ephemeral=True)
+
+
+def local_fire_time(day, tz: ZoneInfo) -> datetime:
+    """The auto-post time on a given local date, as an aware UTC datetime."""
+    naive = datetime(day.year, day.month, day.day, AUTO_POST_HOUR, AUTO_POST_MINUTE)
+    # Converting to UTC moves a time inside a spring-forward gap to just after it;
+    # for a repeated fall-back hour fold=0 picks the first occurrence
+    return naive.replace(tzinfo=tz).astimezone(timezone.utc)
+
+
+# Fire times are compared and subtracted in UTC: Python compares two datetimes that share a
+# tzinfo by wall clock, which is wrong across a DST change.
+
+def next_fire_time(now: datetime) -> datetime:
+    """The first auto-post time strictly after now, in UTC."""
+    tz = ZoneInfo(TIMEZONE_NAME)
+    now = now.astimezone(timezone.utc)
+    today = now.astimezone(tz).date()
+    fire = local_fire_time(today, tz)
+    if fire <= now:
+        fire = local_fire_time(today + timedelta(days=1), tz)
+    return fire
+
+
+def previous_fire_time(now: datetime) -> datetime:
+    """The latest auto-post time at or before now, in UTC."""
+    tz = ZoneInfo(TIMEZONE_NAME)
+    now = now.astimezone(timezone.utc)
+    today = now.astimezone(tz).date()
+    fire = local_fire_time(today, tz)
+    if fire > now:
+        fire = local_fire_time(today - timedelta(days=1), tz)
+    return fire
+
+
+def should_catch_up(now: datetime, last_published_at) -> bool:
+    """
+    A missed post is caught up at startup if the most recent auto-post time is within
+    CATCH_UP_WINDOW_HOURS and nothing has been published since it.
+    """
+    now = now.astimezone(timezone.utc)
+    missed = previous_fire_time(now)
+    if now - missed > timedelta(hours=CATCH_UP_WINDOW_HOURS):
+        return False
+    if last_published_at is None:
+        return True
+    if last_published_at.tzinfo is None:
+        last_published_at = last_published_at.replace(tzinfo=timezone.utc)
+    return last_published_at < missed
+
+
+def current_time() -> datetime:
+    return datetime.now(ZoneInfo(TIMEZONE_NAME))
+
+
+async def auto_post_for_guild(guild: discord.Guild):
+    qotd_channel = guild.get_channel(QOTD_CHANNEL_ID)
+    if not qotd_channel:
+        return
 
-                await cur.execute(
-                    """
-                    SELECT COUNT(*) AS count FROM qotds
-                    WHERE guild_id = %s AND is_published = FALSE
-                    """,
-                    (guild.id,),
-                )
-                count = (await cur.fetchone())["count"]
+    record, count = await dequeue_qotd(guild.id)
+    if not record:
+        return
 
-        embed = discord.Embed(
-            title="Question of the Day",
-            description=record["question"],
-            color=discord.Color.from_str(EMBED_COLOR),
-        )
-        if record.get("image_url"):
-            embed.set_image(url=record["image_url"])
-        embed.set_footer(text=f"| Author: {record['author']} | {count} QOTDs left in queue |")
-
-        message = await qotd_channel.send(
-            content=f"<@&{QOTD_ROLE_ID}>",
-            embed=embed,
-            allowed_mentions=discord.AllowedMentions(roles=True),
-        )
-        await message.create_thread(name=THREAD_NAME, auto_archive_duration=THREAD_AUTO_ARCHIVE_MINUTES)
+    message = await send_qotd(qotd_channel, record, count)
+    await message.create_thread(name=THREAD_NAME, auto_archive_duration=THREAD_AUTO_ARCHIVE_MINUTES)
+
+
+async def auto_post_qotd():
+    for guild in bot.guilds:
+        try:
+            await auto_post_for_guild(guild)
+        except Exception as e:
+            print(f"ERROR auto-posting QOTD in {guild.id}:", e)
+
+
+async def catch_up_missed_qotd(now: datetime):
+    for guild in bot.guilds:
+        try:
+            async with bot.pool.acquire() as conn:
+                async with conn.cursor(aiomysql.DictCursor) as cur:
+                    await cur.execute(
+                        "SELECT MAX(published_at) AS last_published_at FROM qotds WHERE guild_id = %s",
+                        (guild.id,),
+                    )
+                    last_published_at = (await cur.fetchone())["last_published_at"]
+
+            if should_catch_up(now, last_published_at):
+                await auto_post_for_guild(guild)
+        except Exception as e:
+            print(f"ERROR catching up QOTD in {guild.id}:", e)
+
+
+async def run_qotd_scheduler(clock=current_time):
+    """Sleeps until the next exact auto-post time; clock can be swapped out for testing."""
+    await bot.wait_until_ready()
+    await catch_up_missed_qotd(clock())
+
+    while True:
+        fire = next_fire_time(clock())
+        # Sleep in chunks so a suspended host or clock change can't make us oversleep by much
+        while (remaining := (fire - clock()).total_seconds()) > 0:
+            await asyncio.sleep(min(remaining, 3600))
+        await auto_post_qotd()
+
+
+def start_qotd_scheduler():
+    global qotd_task
+    if qotd_task is None or qotd_task.done():
+        qotd_task = asyncio.create_task(run_qotd_scheduler())
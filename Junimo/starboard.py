@@ -1,4 +1,8 @@
 import discord
+import aiomysql
+import asyncio
+import time
+from collections import OrderedDict
 from datetime import datetime, timezone
 
 # =========================
@@ -6,7 +10,7 @@ from datetime import datetime, timezone
 # =========================
 
 STARBOARD_CHANNEL_ID = 1323794218539548682
-EXCLUDED_CHANNEL_IDS = [
+EXCLUDED_CHANNEL_IDS = {
     1348402616249487360,
     1322427028053561408,
     1348402476759515276,
@@ -18,19 +22,50 @@ EXCLUDED_CHANNEL_IDS = [
     1468514791583912150,
     1468513987703341097,
     1403497138373001286,
-    1468513987703341097
-]
+}
 
 STAR_EMOJIS = {"🍅","⭐"}
 STAR_THRESHOLD = 3
+# Remove a starboard post when its count drops below STAR_THRESHOLD (otherwise the count is just updated)
+REMOVE_BELOW_THRESHOLD = True
 
 EMBED_COLOR = "#9CEC61"
 
+# How many starboard entries are kept in memory; the rest are looked up in the database
+ENTRY_CACHE_SIZE = 2000
+# How many (message, emoji) pairs known to have no starboard post are remembered, so repeat reactions
+# on messages that were never boarded don't query the database
+UNBOARDED_CACHE_SIZE = 10000
+# How long (in seconds) to wait before retrying a starboard entry the database didn't accept
+ENTRY_RETRY_SECONDS = 30
+# How long (in seconds) reaction counts are trusted before the message is fetched again
+REACTION_CACHE_TTL_SECONDS = 600
+# Reaction changes within this many seconds of each other are combined into one starboard edit
+EDIT_DEBOUNCE_SECONDS = 3
+# How often (in seconds) the number of starboard edits sent and saved by debouncing is printed; 0 turns it off
+STATS_REPORT_SECONDS = 3600
+
 # =========================
 # BOT HOOKUP
 # =========================
 bot = None
-starred_messages = {}
+
+# (source_message_id, emoji) -> starboard_message_id, most recently used last
+starred_messages = OrderedDict()
+# starboard_message_id -> (source_message_id, emoji)
+starboard_sources = OrderedDict()
+# source_message_id -> TrackedMessage
+tracked_messages = OrderedDict()
+pending_fetches = {}  # source_message_id -> Future resolving to a TrackedMessage
+pending_posts = {}  # (source_message_id, emoji) -> Future resolved once its starboard post is saved
+# (source_message_id, emoji) pairs with no starboard entry, most recently used last
+unboarded = OrderedDict()
+# (source_message_id, emoji) -> (source_channel_id, starboard_message_id) posted but not yet saved
+unsaved_entries = {}
+entry_retry_task = None
+pending_edits = {}  # (source_message_id, emoji) -> debounced edit task
+starboard_stats = {"edits_sent": 0, "edits_saved": 0}  # reset after every report
+stats_report_task = None
 
 
 def set_bot(bot_instance):
@@ -38,6 +73,336 @@ def set_bot(bot_instance):
     bot = bot_instance
 
 
+# -------- Entry storage --------
+
+def cache_entry(key: tuple, starboard_message_id: int):
+    starred_messages[key] = starboard_message_id
+    starred_messages.move_to_end(key)
+    starboard_sources[starboard_message_id] = key
+    starboard_sources.move_to_end(starboard_message_id)
+
+    while len(starred_messages) > ENTRY_CACHE_SIZE:
+        starred_messages.popitem(last=False)
+    while len(starboard_sources) > ENTRY_CACHE_SIZE:
+        starboard_sources.popitem(last=False)
+
+
+def uncache_entry(key: tuple):
+    starboard_message_id = starred_messages.pop(key, None)
+    if starboard_message_id is not None:
+        starboard_sources.pop(starboard_message_id, None)
+    unsaved_entries.pop(key, None)
+    cache_unboarded(key)
+
+
+def cache_unboarded(key: tuple):
+    unboarded[key] = True
+    unboarded.move_to_end(key)
+    while len(unboarded) > UNBOARDED_CACHE_SIZE:
+        unboarded.popitem(last=False)
+
+
+async def get_entry(key: tuple):
+    """Returns the starboard message id for (source_message_id, emoji), or None if it was never boarded."""
+    if key in starred_messages:
+        starred_messages.move_to_end(key)
+        return starred_messages[key]
+
+    # Posted while the database was unreachable, and maybe already evicted from the cache above
+    if key in unsaved_entries:
+        return unsaved_entries[key][1]
+
+    if key in unboarded:
+        unboarded.move_to_end(key)
+        return None
+
+    async with bot.pool.acquire() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cur:
+            await cur.execute(
+                """
+                SELECT starboard_message_id FROM starboard_entries
+                WHERE source_message_id = %s AND emoji = %s
+                """,
+                key,
+            )
+            row = await cur.fetchone()
+
+    if not row:
+        cache_unboarded(key)
+        return None
+    cache_entry(key, row["starboard_message_id"])
+    return row["starboard_message_id"]
+
+
+async def get_entries_for_source(source_message_id: int) -> list:
+    """Every (emoji, starboard_message_id) boarded for a source message."""
+    keys = [(source_message_id, emoji) for emoji in STAR_EMOJIS]
+    if all(key in unboarded for key in keys):
+        return []
+
+    async with bot.pool.acquire() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cur:
+            await cur.execute(
+                "SELECT emoji, starboard_message_id FROM starboard_entries WHERE source_message_id = %s",
+                (source_message_id,),
+            )
+            entries = {row["emoji"]: row["starboard_message_id"] for row in await cur.fetchall()}
+
+    for (source, emoji), (_, starboard_message_id) in unsaved_entries.items():
+        if source == source_message_id:
+            entries[emoji] = starboard_message_id
+    return list(entries.items())
+
+
+async def save_entry(key: tuple, source_channel_id: int, starboard_message_id: int):
+    """
+    Remembers a new starboard post. It's cached before the database write, so that if the write
+    fails, later reactions still find the post instead of sending a duplicate; the write is retried.
+    """
+    global entry_retry_task
+    unboarded.pop(key, None)
+    cache_entry(key, starboard_message_id)
+    unsaved_entries[key] = (source_channel_id, starboard_message_id)
+
+    if not await write_unsaved_entries() and (entry_retry_task is None or entry_retry_task.done()):
+        entry_retry_task = asyncio.create_task(retry_unsaved_entries())
+
+
+async def write_unsaved_entries() -> bool:
+    """Writes every entry the database hasn't accepted yet; returns False if one of them failed."""
+    for key, entry in list(unsaved_entries.items()):
+        try:
+            async with bot.pool.acquire() as conn:
+                async with conn.cursor() as cur:
+                    await cur.execute(
+                        """
+                        INSERT INTO starboard_entries (source_message_id, emoji, source_channel_id, starboard_message_id)
+                        VALUES (%s, %s, %s, %s)
+                        ON DUPLICATE KEY UPDATE starboard_message_id = VALUES(starboard_message_id)
+                        """,
+                        (key[0], key[1], entry[0], entry[1]),
+                    )
+        except Exception as e:
+            print(f"Warning: couldn't save starboard entry {key}, retrying in {ENTRY_RETRY_SECONDS}s: {e}")
+            return False
+        # Unless it was replaced or deleted while the write was in flight
+        if unsaved_entries.get(key) == entry:
+            del unsaved_entries[key]
+    return True
+
+
+async def retry_unsaved_entries():
+    while unsaved_entries:
+        await asyncio.sleep(ENTRY_RETRY_SECONDS)
+        await write_unsaved_entries()
+
+
+async def delete_entry(key: tuple):
+    # Forgotten first, so an unsaved copy can't be written back after the delete
+    uncache_entry(key)
+    async with bot.pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                "DELETE FROM starboard_entries WHERE source_message_id = %s AND emoji = %s",
+                key,
+            )
+
+
+async def delete_entry_by_starboard_message(starboard_message_id: int):
+    key = starboard_sources.get(starboard_message_id)
+    if key is None:
+        key = next((k for k, entry in unsaved_entries.items() if entry[1] == starboard_message_id), None)
+    if key is not None:
+        uncache_entry(key)
+    async with bot.pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                "DELETE FROM starboard_entries WHERE starboard_message_id = %s",
+                (starboard_message_id,),
+            )
+
+
+# -------- Stats --------
+
+async def report_stats_forever():
+    while True:
+        await asyncio.sleep(STATS_REPORT_SECONDS)
+        sent, saved = starboard_stats["edits_sent"], starboard_stats["edits_saved"]
+        if sent or saved:
+            print(
+                f"[starboard] Last {STATS_REPORT_SECONDS}s: {sent} edits sent, "
+                f"{saved} reaction changes folded into them by debouncing"
+            )
+            starboard_stats["edits_sent"] = starboard_stats["edits_saved"] = 0
+
+
+def start_stats_reports():
+    global stats_report_task
+    if STATS_REPORT_SECONDS and (stats_report_task is None or stats_report_task.done()):
+        stats_report_task = asyncio.create_task(report_stats_forever())
+
+
+# -------- Reaction counts --------
+
+class TrackedMessage:
+    """A source message plus its star reaction counts, kept current from gateway events."""
+
+    __slots__ = ("message", "counts", "expires_at")
+
+    def __init__(self, message: discord.Message):
+        self.message = message
+        self.counts = {
+            str(reaction.emoji): reaction.count
+            for reaction in message.reactions
+            if str(reaction.emoji) in STAR_EMOJIS
+        } if message else {}
+        self.expires_at = time.monotonic() + REACTION_CACHE_TTL_SECONDS
+
+
+async def get_tracked_message(channel_id: int, message_id: int):
+    """
+    Returns the tracked counts for a message, fetching it once to seed them when it isn't cached.
+    The fetched counts already include the reaction that triggered the fetch.
+    Returns (tracked, seeded) where seeded is True if the counts were just fetched.
+    """
+    tracked = tracked_messages.get(message_id)
+    if tracked and tracked.expires_at > time.monotonic():
+        tracked_messages.move_to_end(message_id)
+        return tracked, False
+
+    # Reactions arriving while the seed fetch is in flight wait for it instead of fetching again
+    pending = pending_fetches.get(message_id)
+    if pending:
+        tracked = await pending
+        return tracked, True
+
+    channel = bot.get_channel(channel_id)
+    if not channel:
+        return None, False
+
+    future = asyncio.get_running_loop().create_future()
+    pending_fetches[message_id] = future
+    tracked = None
+    try:
+        message = await channel.fetch_message(message_id)
+        tracked = TrackedMessage(message)
+        tracked_messages[message_id] = tracked
+        while len(tracked_messages) > ENTRY_CACHE_SIZE:
+            tracked_messages.popitem(last=False)
+    except discord.NotFound:
+        pass
+    finally:
+        del pending_fetches[message_id]
+        future.set_result(tracked)
+
+    return tracked, True
+
+
+def build_starboard_embed(message: discord.Message) -> discord.Embed:
+    embed = discord.Embed(
+        description=(f"{message.content}\n\n[Jump to Message!]({message.jump_url})" if message.content else f"[No text]\n\n[Jump to Message!]({message.jump_url})"),
+        color=discord.Color.from_str(EMBED_COLOR),
+    )
+    embed.set_author(
+        name=str(message.author),
+        icon_url=message.author.display_avatar.url,
+    )
+    embed.timestamp = datetime.now(timezone.utc)
+
+    if message.attachments:
+        embed.set_image(url=message.attachments[0].url)
+
+    return embed
+
+
+async def update_starboard(tracked: TrackedMessage, emoji: str):
+    message = tracked.message
+    key = (message.id, emoji)
+
+    # Only one post per key may be in flight: reactions that cross the threshold together
+    # wait for it and then edit the post instead of sending a second one
+    while True:
+        pending = pending_posts.get(key)
+        if pending:
+            await pending
+        starboard_message_id = await get_entry(key)
+        if key not in pending_posts:
+            break
+
+    if starboard_message_id is not None:
+        schedule_edit(key, tracked)
+        return
+
+    count = tracked.counts.get(emoji, 0)
+    if count < STAR_THRESHOLD:
+        return
+
+    starboard = bot.get_channel(STARBOARD_CHANNEL_ID)
+    if not starboard:
+        return
+
+    future = asyncio.get_running_loop().create_future()
+    pending_posts[key] = future
+    try:
+        starboard_msg = await starboard.send(content=f"{emoji} {count}", embed=build_starboard_embed(message))
+        await save_entry(key, message.channel.id, starboard_msg.id)
+    finally:
+        del pending_posts[key]
+        future.set_result(None)
+
+
+def schedule_edit(key: tuple, tracked: TrackedMessage):
+    """Coalesces every reaction change within EDIT_DEBOUNCE_SECONDS into one edit with the latest count."""
+    if key in pending_edits:
+        starboard_stats["edits_saved"] += 1
+        return
+    pending_edits[key] = asyncio.create_task(flush_edit(key, tracked))
+
+
+async def flush_edit(key: tuple, tracked: TrackedMessage):
+    try:
+        await asyncio.sleep(EDIT_DEBOUNCE_SECONDS)
+    finally:
+        # Events arriving from here on schedule a fresh edit
+        pending_edits.pop(key, None)
+
+    starboard = bot.get_channel(STARBOARD_CHANNEL_ID)
+    starboard_message_id = await get_entry(key)
+    if not starboard or starboard_message_id is None:
+        return
+
+    # The message may have been re-seeded while the edit was pending
+    tracked = tracked_messages.get(key[0], tracked)
+    emoji = key[1]
+    count = tracked.counts.get(emoji, 0)
+    post = starboard.get_partial_message(starboard_message_id)
+    try:
+        if count < STAR_THRESHOLD and REMOVE_BELOW_THRESHOLD:
+            await post.delete()
+            await delete_entry(key)
+        else:
+            # Only the count in the content changes, so edit it in place without fetching the post
+            await post.edit(content=f"{emoji} {count}")
+            starboard_stats["edits_sent"] += 1
+    except discord.NotFound:
+        await delete_entry(key)
+    except discord.HTTPException as e:
+        print(f"Warning: couldn't update starboard post {starboard_message_id}: {e}")
+
+
+async def clear_reactions(message_id: int, emojis: set):
+    """All of the given reactions were removed from a message at once; no fetch is needed to know the count is 0."""
+    tracked = tracked_messages.get(message_id)
+    if tracked is None:
+        # Not cached, and there's nothing to seed: an empty tracker is enough to drive the update
+        tracked = TrackedMessage(None)
+
+    for emoji in emojis:
+        tracked.counts[emoji] = 0
+        if await get_entry((message_id, emoji)) is not None:
+            schedule_edit((message_id, emoji), tracked)
+
+
 def setup_starboard(bot_instance: discord.Client):
     set_bot(bot_instance)
 
@@ -51,49 +416,68 @@ def setup_starboard(bot_instance: discord.Client):
         if payload.channel_id in EXCLUDED_CHANNEL_IDS:
             return
 
-        channel = bot.get_channel(payload.channel_id)
-        if not channel:
+        tracked, seeded = await get_tracked_message(payload.channel_id, payload.message_id)
+        if not tracked:
             return
+        if not seeded:
+            tracked.counts[emoji] = tracked.counts.get(emoji, 0) + 1
 
-        try:
-            message = await channel.fetch_message(payload.message_id)
-        except discord.NotFound:
-            return
+        await update_starboard(tracked, emoji)
 
-        count = 0
-        for reaction in message.reactions:
-            if str(reaction.emoji) == emoji:
-                count = reaction.count
-                break
+    @bot_instance.event
+    async def on_raw_reaction_remove(payload: discord.RawReactionActionEvent):
+        emoji = str(payload.emoji)
 
-        if count < STAR_THRESHOLD:
+        if emoji not in STAR_EMOJIS:
             return
 
-        starboard = bot.get_channel(STARBOARD_CHANNEL_ID)
-        if not starboard:
+        if payload.channel_id in EXCLUDED_CHANNEL_IDS:
             return
 
-        embed = discord.Embed(
-            description=(f"{message.content}\n\n[Jump to Message!]({message.jump_url})" if message.content else f"[No text]\n\n[Jump to Message!]({message.jump_url})"),
-            color=discord.Color.from_str(EMBED_COLOR),
-        )
-        embed.set_author(
-            name=str(message.author),
-            icon_url=message.author.display_avatar.url,
-        )
-        embed.timestamp = datetime.now(timezone.utc)
-
-        if message.attachments:
-            embed.set_image(url=message.attachments[0].url)
-
-        key = (message.id, emoji)
-
-        if key in starred_messages:
-            try:
-                old_msg = await starboard.fetch_message(starred_messages[key])
-                await old_msg.edit(content=f"{emoji} {count}", embed=embed)
-            except discord.NotFound:
-                del starred_messages[key]
+        tracked = tracked_messages.get(payload.message_id)
+        if tracked and tracked.expires_at > time.monotonic():
+            tracked.counts[emoji] = max(0, tracked.counts.get(emoji, 0) - 1)
+        elif await get_entry((payload.message_id, emoji)) is not None:
+            # Boarded but not tracked: seed it, the fetched count already reflects this removal
+            tracked, _ = await get_tracked_message(payload.channel_id, payload.message_id)
         else:
-            starboard_msg = await starboard.send(content=f"{emoji} {count}", embed=embed)
-            starred_messages[key] = starboard_msg.id
+            # Never boarded, so a removal can't change anything
+            return
+
+        if tracked:
+            await update_starboard(tracked, emoji)
+
+    @bot_instance.event
+    async def on_raw_reaction_clear(payload: discord.RawReactionClearEvent):
+        await clear_reactions(payload.message_id, STAR_EMOJIS)
+
+    @bot_instance.event
+    async def on_raw_reaction_clear_emoji(payload: discord.RawReactionClearEmojiEvent):
+        emoji = str(payload.emoji)
+        if emoji in STAR_EMOJIS:
+            await clear_reactions(payload.message_id, {emoji})
+
+    @bot_instance.event
+    async def on_raw_message_delete(payload: discord.RawMessageDeleteEvent):
+        # Starboard post deleted by hand: forget it so the message can be boarded again
+        if payload.channel_id == STARBOARD_CHANNEL_ID:
+            await delete_entry_by_starboard_message(payload.message_id)
+            return
+
+        tracked_messages.pop(payload.message_id, None)
+
+        # Source message deleted: its starboard posts no longer point anywhere, so remove them too
+        if payload.channel_id in EXCLUDED_CHANNEL_IDS:
+            return
+        entries = await get_entries_for_source(payload.message_id)
+        if not entries:
+            return
+
+        starboard = bot.get_channel(STARBOARD_CHANNEL_ID)
+        for emoji, starboard_message_id in entries:
+            if starboard:
+                try:
+                    await starboard.get_partial_message(starboard_message_id).delete()
+                except discord.NotFound:
+                    pass
+            await delete_entry((payload.message_id, emoji))
@@ -0,0 +1,196 @@
+import asyncio
+import random
+
+import pytest
+
+import counting
+
+
+# -------- Fakes --------
+
+class FakeChannel:
+    def __init__(self, channel_id, log):
+        self.id = channel_id
+        self.log = log
+
+    async def send(self, content=None, embed=None):
+        await asyncio.sleep(0)
+        self.log.append(("send", embed.title if embed else content))
+        return FakeMessage(None, self, content, log=self.log)
+
+
+class FakeAuthor:
+    def __init__(self, user_id):
+        self.id = user_id
+        self.bot = False
+        self.mention = f"<@{user_id}>"
+
+    async def add_roles(self, role):
+        pass
+
+
+class FakeGuild:
+    def __init__(self, role):
+        self.role = role
+
+    def get_role(self, role_id):
+        return self.role
+
+
+class FakeMessage:
+    next_id = 0
+
+    def __init__(self, author, channel, content, guild=None, log=None):
+        FakeMessage.next_id += 1
+        self.id = FakeMessage.next_id
+        self.author = author
+        self.channel = channel
+        self.content = content
+        self.guild = guild
+        self.log = log
+
+    async def delete(self):
+        await asyncio.sleep(0)
+        self.log.append(("delete", self.content))
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    counting.current_count = 0
+    counting.last_user_id = None
+    counting.counting_queues.clear()
+
+    async def no_expiry(member, role, seconds):
+        pass
+
+    monkeypatch.setattr(counting, "schedule_role_removal", no_expiry)
+    yield
+    counting.counting_queues.clear()
+
+
+async def drain():
+    # A worker that died would leave its queue unfinished forever
+    for queue in counting.counting_queues.values():
+        await asyncio.wait_for(queue.join(), timeout=10)
+
+
+def reference_count(messages):
+    """The count a strictly sequential bot ends on, and the outcome of every message."""
+    count, last = 0, None
+    outcomes = []
+    for author_id, content in messages:
+        try:
+            number = int(content.strip())
+        except ValueError:
+            outcomes.append("invalid")
+            continue
+        if number == count + 1 and author_id != last:
+            count, last = number, author_id
+            outcomes.append("correct")
+        else:
+            count, last = 0, None
+            outcomes.append("reset")
+    return count, outcomes
+
+
+def test_stress_replay_matches_sequential_judging():
+    """5,000 messages from 20 users, delivered as fast as the gateway can, with deliberate mistakes."""
+    rng = random.Random(0)
+    messages = []
+    count, last = 0, None
+    for _ in range(5000):
+        author_id = rng.choice([u for u in range(20) if u != last])
+        roll = rng.random()
+        if roll < 0.02:
+            content = "not a number"
+        elif roll < 0.04:
+            content = str(count + 2)  # wrong number
+            count, last = 0, None
+        else:
+            content = str(count + 1)
+            count, last = count + 1, author_id
+        messages.append((author_id, content))
+
+    expected_count, expected_outcomes = reference_count(messages)
+
+    async def main():
+        log = []
+        channel = FakeChannel(counting.COUNTING_CHANNEL_ID, log)
+        guild = FakeGuild(role=None)
+        authors = {}
+        # Every message is handed to the handler before any side effect gets to run
+        await asyncio.gather(*[
+            counting.counting_on_message(
+                FakeMessage(authors.setdefault(a, FakeAuthor(a)), channel, c, guild=guild, log=log)
+            )
+            for a, c in messages
+        ])
+        await drain()
+        return log
+
+    log = asyncio.run(main())
+
+    assert counting.current_count == expected_count
+
+    # Side effects happen once per message, in message order
+    deleted = [content for kind, content in log if kind == "delete" and content != counting.TRIGGER_BYPASS_MESSAGE]
+    expected_deleted = [c for (a, c), o in zip(messages, expected_outcomes) if o != "correct"]
+    assert deleted == expected_deleted
+    resets = [content for kind, content in log if kind == "send" and content == "Counting Reset"]
+    assert len(resets) == expected_outcomes.count("reset")
+
+
+def test_worker_survives_failing_side_effects(monkeypatch):
+    calls = []
+
+    async def failing_expiry(member, role, seconds):
+        calls.append(member.id)
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(counting, "schedule_role_removal", failing_expiry)
+
+    class Role:
+        mention = "<@&1>"
+
+    async def main():
+        log = []
+        channel = FakeChannel(counting.COUNTING_CHANNEL_ID, log)
+        guild = FakeGuild(role=Role())
+        for author_id, content in enumerate(["1", "5", "1", "7"]):
+            await counting.counting_on_message(FakeMessage(FakeAuthor(author_id), channel, content, guild=guild, log=log))
+        await drain()
+        return log
+
+    log = asyncio.run(main())
+
+    # Both resets were handled even though the first one's role removal blew up
+    assert len(calls) == 2
+    assert [c for kind, c in log if kind == "send"].count("Counting Reset") == 2
+
+
+def test_reset_without_loser_role():
+    async def main():
+        log = []
+        channel = FakeChannel(counting.COUNTING_CHANNEL_ID, log)
+        await counting.counting_on_message(FakeMessage(FakeAuthor(1), channel, "3", guild=FakeGuild(role=None), log=log))
+        await drain()
+        return log
+
+    log = asyncio.run(main())
+    assert ("send", "Counting Reset") in log
+    assert counting.current_count == 0
+
+
+def test_stale_flush_never_overwrites_a_newer_write(tmp_path, monkeypatch):
+    monkeypatch.setattr(counting, "DATA_FILE", str(tmp_path / "counting_data.json"))
+
+    counting.current_count = 41
+    stale = counting.snapshot_count_data()  # taken by the flush task just before shutdown
+    counting.current_count = 42
+    counting.flush_count_data_now()
+
+    # The flush task's thread finishes after the shutdown flush
+    counting.write_count_file(*stale)
+
+    counting.load_count_data()
+    assert counting.current_count == 42
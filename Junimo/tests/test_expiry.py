@@ -0,0 +1,48 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import expiry
+
+
+def test_scheduler_retries_a_failed_load(monkeypatch):
+    loads = []
+    expired = []
+
+    async def flaky_load():
+        loads.append(time.monotonic())
+        if len(loads) == 1:
+            raise RuntimeError("pool not ready")
+        expiry.add_pending(1, 10, 20, 30, int(time.time()) - 5)
+
+    async def fake_expire(expiry_id, guild_id, user_id, role_id):
+        expired.append(expiry_id)
+
+    async def ready():
+        pass
+
+    monkeypatch.setattr(expiry, "EXPIRY_RETRY_SECONDS", 0.01)
+    monkeypatch.setattr(expiry, "load_pending_expiries", flaky_load)
+    monkeypatch.setattr(expiry, "expire_role", fake_expire)
+    monkeypatch.setattr(expiry, "bot", SimpleNamespace(wait_until_ready=ready))
+    monkeypatch.setattr(expiry, "expiry_heap", [])
+    monkeypatch.setattr(expiry, "pending_expiries", {})
+
+    async def main():
+        task = asyncio.create_task(expiry.run_expiry_scheduler())
+        try:
+            # An expiry scheduled while the load keeps failing is still removed on time
+            await asyncio.sleep(0)
+            expiry.add_pending(2, 10, 21, 30, int(time.time()) - 1)
+            for _ in range(100):
+                if len(expired) == 2:
+                    break
+                await asyncio.sleep(0.01)
+            assert not task.done()
+        finally:
+            task.cancel()
+
+    asyncio.run(main())
+
+    assert len(loads) == 2
+    assert sorted(expired) == [1, 2]
@@ -0,0 +1,194 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from zoneinfo import ZoneInfo
+
+import pytest
+
+import qotd
+
+TZ = ZoneInfo(qotd.TIMEZONE_NAME)
+UTC = timezone.utc
+
+# America/Chicago in 2024: clocks jump 02:00 -> 03:00 on March 10 and repeat 01:00-01:59 on November 3
+
+
+def post_at(monkeypatch, hour, minute):
+    monkeypatch.setattr(qotd, "AUTO_POST_HOUR", hour)
+    monkeypatch.setattr(qotd, "AUTO_POST_MINUTE", minute)
+
+
+# -------- Skip rules --------
+
+def test_spring_forward_gap_posts_once_just_after_the_gap(monkeypatch):
+    post_at(monkeypatch, 2, 30)  # 02:30 doesn't exist on March 10
+
+    fire = qotd.next_fire_time(datetime(2024, 3, 10, 0, 0, tzinfo=TZ))
+    assert fire == datetime(2024, 3, 10, 8, 30, tzinfo=UTC)  # 03:30 CDT
+    assert fire.astimezone(TZ).hour == 3
+
+    # The day isn't skipped or doubled: the next post is the regular one on March 11
+    assert qotd.next_fire_time(fire) == datetime(2024, 3, 11, 2, 30, tzinfo=TZ)
+
+
+def test_fall_back_repeated_hour_posts_once(monkeypatch):
+    post_at(monkeypatch, 1, 30)  # 01:30 happens twice on November 3
+
+    fire = qotd.next_fire_time(datetime(2024, 11, 3, 0, 0, tzinfo=TZ))
+    assert fire == datetime(2024, 11, 3, 6, 30, tzinfo=UTC)  # first occurrence, 01:30 CDT
+
+    # The second 01:30 (07:30 UTC) is not another fire time
+    after_first = datetime(2024, 11, 3, 6, 31, tzinfo=UTC)
+    assert qotd.next_fire_time(after_first) == datetime(2024, 11, 4, 7, 30, tzinfo=UTC)  # 01:30 CST
+    assert qotd.previous_fire_time(datetime(2024, 11, 3, 7, 45, tzinfo=UTC)) == fire
+
+
+def test_fire_time_keeps_local_wall_clock_across_dst():
+    before = qotd.next_fire_time(datetime(2024, 3, 9, 12, 0, tzinfo=TZ))
+    after = qotd.next_fire_time(before)
+    assert before.astimezone(TZ).day == 9
+    assert (after - before) == timedelta(hours=23)
+    assert (before.astimezone(TZ).hour, before.astimezone(TZ).minute) == (qotd.AUTO_POST_HOUR, qotd.AUTO_POST_MINUTE)
+    assert (after.astimezone(TZ).hour, after.astimezone(TZ).minute) == (qotd.AUTO_POST_HOUR, qotd.AUTO_POST_MINUTE)
+
+
+def test_next_fire_time_is_strictly_after_now():
+    fire = qotd.next_fire_time(datetime(2024, 6, 1, 12, 0, tzinfo=TZ))
+    assert qotd.next_fire_time(fire) == fire + timedelta(days=1)
+    assert qotd.previous_fire_time(fire) == fire
+
+
+# -------- Catch-up rules --------
+
+MISSED = datetime(2024, 6, 1, qotd.AUTO_POST_HOUR, qotd.AUTO_POST_MINUTE, tzinfo=TZ)
+WINDOW = timedelta(hours=qotd.CATCH_UP_WINDOW_HOURS)
+
+
+@pytest.mark.parametrize("now, expected", [
+    (MISSED, True),
+    (MISSED + WINDOW, True),
+    (MISSED + WINDOW + timedelta(seconds=1), False),
+    (MISSED - timedelta(seconds=1), False),  # the previous day's post is long past the window
+])
+def test_catch_up_window_edges(now, expected):
+    assert qotd.should_catch_up(now, None) is expected
+
+
+def test_catch_up_with_nothing_ever_published():
+    assert qotd.should_catch_up(MISSED + timedelta(minutes=5), None)
+
+
+def test_catch_up_skipped_when_already_published():
+    now = MISSED + timedelta(hours=1)
+    assert not qotd.should_catch_up(now, MISSED + timedelta(seconds=2))
+    assert qotd.should_catch_up(now, MISSED - timedelta(days=1))
+
+
+def test_catch_up_treats_naive_published_at_as_utc():
+    now = MISSED + timedelta(hours=1)
+    published_utc = (MISSED + timedelta(minutes=1)).astimezone(UTC).replace(tzinfo=None)
+    assert not qotd.should_catch_up(now, published_utc)
+
+
+# -------- Scheduler loop with an injected clock --------
+
+class StopScheduler(Exception):
+    pass
+
+
+def test_scheduler_posts_at_each_fire_time(monkeypatch):
+    # A UTC clock, so adding the slept seconds moves it by real elapsed time
+    clock = {"now": datetime(2024, 3, 8, 18, 0, tzinfo=UTC)}  # 12:00 CST
+    posts = []
+    catch_ups = []
+
+    async def fake_sleep(seconds):
+        clock["now"] += timedelta(seconds=seconds)
+
+    async def fake_catch_up(now):
+        catch_ups.append(now)
+
+    async def fake_auto_post():
+        posts.append(clock["now"])
+        if len(posts) == 4:
+            raise StopScheduler
+
+    async def ready():
+        pass
+
+    monkeypatch.setattr(qotd.asyncio, "sleep", fake_sleep)
+    monkeypatch.setattr(qotd, "catch_up_missed_qotd", fake_catch_up)
+    monkeypatch.setattr(qotd, "auto_post_qotd", fake_auto_post)
+    monkeypatch.setattr(qotd, "bot", SimpleNamespace(wait_until_ready=ready))
+
+    with pytest.raises(StopScheduler):
+        asyncio.run(qotd.run_qotd_scheduler(clock=lambda: clock["now"]))
+
+    assert catch_ups == [datetime(2024, 3, 8, 18, 0, tzinfo=UTC)]
+    # One post per day at the local post time, straight through the March 10 DST change
+    assert [p.astimezone(TZ).date().day for p in posts] == [8, 9, 10, 11]
+    assert all(
+        (p.astimezone(TZ).hour, p.astimezone(TZ).minute) == (qotd.AUTO_POST_HOUR, qotd.AUTO_POST_MINUTE)
+        for p in posts
+    )
+
+
+class FailingPool:
+    """A pool whose connections fail for the listed guild ids, and report no QOTD published yet otherwise."""
+
+    def __init__(self, failing_guild_ids):
+        self.failing_guild_ids = failing_guild_ids
+
+    def acquire(self):
+        pool = self
+
+        class Connection:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            def cursor(self, *args):
+                return self
+
+            async def execute(self, query, params):
+                if params[0] in pool.failing_guild_ids:
+                    raise RuntimeError("Unknown column 'published_at'")
+
+            async def fetchone(self):
+                return {"last_published_at": None}
+
+        return Connection()
+
+
+def test_catch_up_errors_dont_stop_the_scheduler(monkeypatch):
+    clock = {"now": MISSED.astimezone(UTC) + timedelta(minutes=5)}
+    posted_guilds = []
+    posts = []
+
+    async def fake_sleep(seconds):
+        clock["now"] += timedelta(seconds=seconds)
+
+    async def fake_post_for_guild(guild):
+        posted_guilds.append(guild.id)
+
+    async def fake_auto_post():
+        posts.append(clock["now"])
+        raise StopScheduler
+
+    async def ready():
+        pass
+
+    guilds = [SimpleNamespace(id=1), SimpleNamespace(id=2)]
+    monkeypatch.setattr(qotd.asyncio, "sleep", fake_sleep)
+    monkeypatch.setattr(qotd, "auto_post_for_guild", fake_post_for_guild)
+    monkeypatch.setattr(qotd, "auto_post_qotd", fake_auto_post)
+    monkeypatch.setattr(qotd, "bot", SimpleNamespace(wait_until_ready=ready, guilds=guilds, pool=FailingPool({1})))
+
+    with pytest.raises(StopScheduler):
+        asyncio.run(qotd.run_qotd_scheduler(clock=lambda: clock["now"]))
+
+    # The first guild's lookup failed, the second still got its missed post, and the loop kept going
+    assert posted_guilds == [2]
+    assert posts == [MISSED.astimezone(UTC) + timedelta(days=1)]
@@ -0,0 +1,139 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import starboard
+
+
+class FakePool:
+    """An in-memory starboard_entries table whose INSERTs fail while `failing` is set."""
+
+    def __init__(self):
+        self.rows = {}  # (source_message_id, emoji) -> starboard_message_id
+        self.queries = []
+        self.failing = False
+
+    def acquire(self):
+        pool = self
+
+        class Connection:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            def cursor(self, *args):
+                return self
+
+            async def execute(self, query, params):
+                pool.queries.append(query.split()[0])
+                self.result = []
+                if query.lstrip().startswith("INSERT"):
+                    if pool.failing:
+                        raise RuntimeError("Lost connection to MySQL server")
+                    pool.rows[(params[0], params[1])] = params[3]
+                elif "emoji = %s" in query:
+                    if params in pool.rows:
+                        self.result = [{"starboard_message_id": pool.rows[params]}]
+
+            async def fetchone(self):
+                return self.result[0] if self.result else None
+
+        return Connection()
+
+
+class FakeStarboardChannel:
+    def __init__(self):
+        self.sent = []
+        self.edited = []
+
+    async def send(self, content=None, embed=None):
+        self.sent.append(content)
+        return SimpleNamespace(id=1000 + len(self.sent))
+
+    def get_partial_message(self, message_id):
+        channel = self
+
+        class Post:
+            async def edit(self, content=None):
+                channel.edited.append((message_id, content))
+
+        return Post()
+
+
+def tracked_message(message_id, count):
+    message = SimpleNamespace(
+        id=message_id,
+        channel=SimpleNamespace(id=5),
+        reactions=[SimpleNamespace(emoji="⭐", count=count)],
+        content="hello",
+        jump_url="https://discord.com/channels/1/5/1",
+        author=SimpleNamespace(display_avatar=SimpleNamespace(url="https://cdn.example/a.png")),
+        attachments=[],
+    )
+    return starboard.TrackedMessage(message)
+
+
+@pytest.fixture
+def board(monkeypatch):
+    pool = FakePool()
+    channel = FakeStarboardChannel()
+    monkeypatch.setattr(starboard, "bot", SimpleNamespace(pool=pool, get_channel=lambda channel_id: channel))
+    monkeypatch.setattr(starboard, "build_starboard_embed", lambda message: None)
+    monkeypatch.setattr(starboard, "EDIT_DEBOUNCE_SECONDS", 0)
+    monkeypatch.setattr(starboard, "ENTRY_RETRY_SECONDS", 0.01)
+    for name in ("starred_messages", "starboard_sources", "unboarded"):
+        monkeypatch.setattr(starboard, name, type(getattr(starboard, name))())
+    monkeypatch.setattr(starboard, "unsaved_entries", {})
+    monkeypatch.setattr(starboard, "pending_edits", {})
+    return pool, channel
+
+
+def test_failed_save_does_not_post_twice(board):
+    pool, channel = board
+
+    async def main():
+        pool.failing = True
+        tracked = tracked_message(1, starboard.STAR_THRESHOLD)
+        await starboard.update_starboard(tracked, "⭐")
+
+        # The database is down, but the next reaction still finds the post and edits it
+        tracked.counts["⭐"] += 1
+        starboard.starred_messages.clear()  # even once the entry has been evicted from the cache
+        await starboard.update_starboard(tracked, "⭐")
+        await asyncio.sleep(0.05)
+        assert channel.sent == [f"⭐ {starboard.STAR_THRESHOLD}"]
+        assert channel.edited == [(1001, f"⭐ {starboard.STAR_THRESHOLD + 1}")]
+
+        # The write is retried until it lands
+        pool.failing = False
+        await asyncio.sleep(0.05)
+        assert pool.rows == {(1, "⭐"): 1001}
+        assert starboard.unsaved_entries == {}
+        assert starboard.entry_retry_task.done()
+
+    asyncio.run(main())
+
+
+def test_unboarded_messages_are_looked_up_once(board, monkeypatch):
+    pool, channel = board
+    monkeypatch.setattr(starboard, "UNBOARDED_CACHE_SIZE", 2)
+
+    async def main():
+        for _ in range(5):
+            await starboard.update_starboard(tracked_message(1, 1), "⭐")
+        assert pool.queries == ["SELECT"]
+
+        # The negative cache is bounded
+        for message_id in (2, 3):
+            await starboard.update_starboard(tracked_message(message_id, 1), "⭐")
+        assert list(starboard.unboarded) == [(2, "⭐"), (3, "⭐")]
+
+        # Crossing the threshold boards the message and takes it out of the negative cache
+        await starboard.update_starboard(tracked_message(3, starboard.STAR_THRESHOLD), "⭐")
+        assert list(starboard.unboarded) == [(2, "⭐")]
+        assert len(channel.sent) == 1
+
+    asyncio.run(main())
@@ -1,12 +1,202 @@
 import io
 import json
+import time
+import asyncio
 import discord
 import aiomysql
 from datetime import datetime
 import random
 
+from matcher import TriggerMatcher
+
+# =========================
+# CONFIGURATION
+# =========================
+
+# How long a guild's triggers stay cached before they are re-read from the database.
+# The triggers table is edited outside of the bot, so this is how edits get picked up.
+TRIGGER_CACHE_TTL_SECONDS = 300
+
+EMBED_COLOR = "#C8FF99"
+
+# =========================
+# BOT HOOKUP
+# =========================
+
 bot = None
 
+# guild_id -> (loaded_at, GuildTriggers)
+trigger_cache = {}
+trigger_cache_locks = {}
+
+
+class Trigger:
+    """A row of the triggers table with its JSON columns parsed once at load time."""
+
+    __slots__ = ("trigger_text", "response_type", "response_text", "required_role_ids", "options", "embed", "error")
+
+    def __init__(self, row: dict):
+        self.trigger_text = row["trigger_text"].lower()
+        self.response_type = row["response_type"]
+        self.response_text = row["response_text"]
+        self.required_role_ids = parse_required_roles(row.get("required_role_ids"))
+        self.options = None
+        self.embed = None
+        self.error = None
+
+        if self.response_type == "random":
+            try:
+                options = json.loads(self.response_text)
+                if isinstance(options, list) and options:
+                    self.options = options
+                else:
+                    self.error = "No valid links available."
+            except json.JSONDecodeError:
+                self.error = "Invalid random link list."
+
+        elif self.response_type == "embed":
+            try:
+                self.embed = build_embed(json.loads(self.response_text))
+            except (AttributeError, TypeError, ValueError):
+                # Bad JSON, or JSON of the wrong shape; only this trigger is affected
+                self.error = "Invalid embed format."
+
+    def allowed_for(self, member) -> bool:
+        if self.required_role_ids is None:
+            return True
+        return any(role.id in self.required_role_ids for role in getattr(member, "roles", ()))
+
+
+class GuildTriggers:
+    """A guild's triggers in table order plus the matcher built over their texts."""
+
+    def __init__(self, triggers: list):
+        self.triggers = triggers
+        self.matcher = TriggerMatcher([trigger.trigger_text for trigger in triggers])
+
+    def matching(self, content: str) -> list:
+        """Triggers found in content, in table order so the first matching row still wins."""
+        return [self.triggers[i] for i in sorted(self.matcher.find_all(content))]
+
+
+def parse_required_roles(raw):
+    # None means unrestricted; a bad or non-list value restricts the trigger to nobody
+    if not raw:
+        return None
+    try:
+        required_roles = json.loads(raw)
+    except json.JSONDecodeError:
+        return frozenset()
+    if not isinstance(required_roles, list):
+        return frozenset()
+    try:
+        return frozenset(required_roles)
+    except TypeError:
+        return frozenset()
+
+
+def build_embed(embed_data: dict) -> discord.Embed:
+    embed = discord.Embed(
+        title=embed_data.get("title"),
+        description=embed_data.get("description"),
+        color=discord.Color.from_str(EMBED_COLOR),
+        url=embed_data.get("url")
+    )
+
+    # Timestamp
+    if "timestamp" in embed_data:
+        try:
+            embed.timestamp = datetime.fromisoformat(embed_data["timestamp"])
+        except Exception:
+            pass
+
+    # Author
+    if "author" in embed_data:
+        author = embed_data["author"]
+        if isinstance(author, dict):
+            embed.set_author(
+                name=author.get("name", ""),
+                url=author.get("url"),
+                icon_url=author.get("icon_url")
+            )
+        else:
+            embed.set_author(name=str(author))
+
+    # Footer
+    if "footer" in embed_data:
+        footer = embed_data["footer"]
+        if isinstance(footer, dict):
+            embed.set_footer(
+                text=footer.get("text", ""),
+                icon_url=footer.get("icon_url")
+            )
+        else:
+            embed.set_footer(text=str(footer))
+
+    # Images
+    if "thumbnail" in embed_data:
+        embed.set_thumbnail(url=embed_data["thumbnail"])
+    if "image" in embed_data:
+        embed.set_image(url=embed_data["image"])
+
+    # Fields
+    if "fields" in embed_data:
+        for field in embed_data["fields"]:
+            embed.add_field(
+                name=field.get("name", "—"),
+                value=field.get("value", "—"),
+                inline=field.get("inline", False)
+            )
+
+    return embed
+
+
+async def load_triggers(guild_id: int) -> GuildTriggers:
+    async with bot.pool.acquire() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cur:
+            await cur.execute("""
+                SELECT trigger_text, response_type, response_text, required_role_ids
+                FROM triggers
+                WHERE guild_id = %s
+                ORDER BY id ASC
+            """, (guild_id,))
+            rows = await cur.fetchall()
+
+    return GuildTriggers([Trigger(row) for row in rows if row["trigger_text"]])
+
+
+async def get_triggers(guild_id: int) -> GuildTriggers:
+    cached = trigger_cache.get(guild_id)
+    if cached and time.monotonic() - cached[0] < TRIGGER_CACHE_TTL_SECONDS:
+        return cached[1]
+
+    # Only one message per guild reloads; the rest wait and reuse the result
+    lock = trigger_cache_locks.setdefault(guild_id, asyncio.Lock())
+    async with lock:
+        cached = trigger_cache.get(guild_id)
+        if cached and time.monotonic() - cached[0] < TRIGGER_CACHE_TTL_SECONDS:
+            return cached[1]
+
+        triggers = await load_triggers(guild_id)
+        trigger_cache[guild_id] = (time.monotonic(), triggers)
+        return triggers
+
+
+async def send_trigger_response(channel, trigger: Trigger):
+    if trigger.error:
+        await channel.send(trigger.error)
+
+    elif trigger.response_type == "plain":
+        await channel.send(trigger.response_text)
+
+    elif trigger.response_type == "random":
+        link = random.choice(trigger.options)
+        await channel.send(f"||{link}||")
+
+    elif trigger.response_type == "embed":
+        await channel.send(embed=trigger.embed)
+
+
 async def trigger_on_message(message: discord.Message):
 #    if message.author.bot and message.content != "!zliwpj":
 #        return
@@ -17,116 +207,21 @@ async def trigger_on_message(message: discord.Message):
     if not message.guild:
         return
 
-    async with bot.pool.acquire() as conn:
-        async with conn.cursor(aiomysql.DictCursor) as cur:
-            await cur.execute("""
-                SELECT trigger_text, response_type, response_text, required_role_ids
-                FROM triggers
-                WHERE guild_id = %s
-            """, (message.guild.id,))
-            rows = await cur.fetchall()
+    guild_triggers = await get_triggers(message.guild.id)
+    if not guild_triggers.triggers:
+        return
 
     content = message.content.lower()
 
-    for row in rows:
-        trigger_text = row["trigger_text"].lower()
-
-        if trigger_text in content:
-
-            # role restrictions
-            required_roles_raw = row.get("required_role_ids")
-
-            if required_roles_raw:
-                try:
-                    required_roles = json.loads(required_roles_raw)
-                    if not isinstance(required_roles, list):
-                        required_roles = []
-                except json.JSONDecodeError:
-                    required_roles = []
-
-                user_role_ids = {r.id for r in message.author.roles}
-
-                if not (
-                    user_role_ids.intersection(required_roles)
-                ):
-                    continue  
-
-            if row["response_type"] == "plain":
-                await message.channel.send(row["response_text"])
-
-            elif row["response_type"] == "random":
-                try:
-                    options = json.loads(row["response_text"])
-                    if isinstance(options, list) and options:
-                        link = random.choice(options)
-                        await message.channel.send(f"||{link}||")
-                    else:
-                        await message.channel.send("No valid links available.")
-                except json.JSONDecodeError:
-                    await message.channel.send("Invalid random link list.")
-
-            elif row["response_type"] == "embed":
-                try:
-                    embed_data = json.loads(row["response_text"])
-                except json.JSONDecodeError:
-                    await message.channel.send("Invalid embed format.")
-                    return
-
-                embed = discord.Embed(
-                    title=embed_data.get("title"),
-                    description=embed_data.get("description"),
-                    color=discord.Color.from_str("#C8FF99"),
-                    url=embed_data.get("url")
-                )
-
-                # Timestamp
-                if "timestamp" in embed_data:
-                    try:
-                        embed.timestamp = datetime.fromisoformat(embed_data["timestamp"])
-                    except Exception:
-                        pass
-
-                # Author
-                if "author" in embed_data:
-                    author = embed_data["author"]
-                    if isinstance(author, dict):
-                        embed.set_author(
-                            name=author.get("name", ""),
-                            url=author.get("url"),
-                            icon_url=author.get("icon_url")
-                        )
-                    else:
-                        embed.set_author(name=str(author))
-
-                # Footer
-                if "footer" in embed_data:
-                    footer = embed_data["footer"]
-                    if isinstance(footer, dict):
-                        embed.set_footer(
-                            text=footer.get("text", ""),
-                            icon_url=footer.get("icon_url")
-                        )
-                    else:
-                        embed.set_footer(text=str(footer))
-
-                # Images
-                if "thumbnail" in embed_data:
-                    embed.set_thumbnail(url=embed_data["thumbnail"])
-                if "image" in embed_data:
-                    embed.set_image(url=embed_data["image"])
-
-                # Fields
-                if "fields" in embed_data:
-                    for field in embed_data["fields"]:
-                        embed.add_field(
-                            name=field.get("name", "—"),
-                            value=field.get("value", "—"),
-                            inline=field.get("inline", False)
-                        )
-
-                await message.channel.send(embed=embed)
-
-            break  
+    for trigger in guild_triggers.matching(content):
+        # role restrictions
+        if not trigger.allowed_for(message.author):
+            continue
+
+        await send_trigger_response(message.channel, trigger)
+        break
+
+
 def set_bot(bot_instance):
     global bot
     bot = bot_instance
@@ -0,0 +1,55 @@
+import random
+import re
+
+# Text transformer behind /uwu. Everything is compiled once at import.
+
+WORD_MAP = {
+    "hi": "hai",
+    "hey": "haiii",
+    "love": "wuv",
+}
+
+PREFIXES = ["UwU ", "H-hewwo?? ", "OWO ", "HIIII! ", "<3 ", "Huohhhh. ", "Haiiiii! ", "*blushes* ", "^-^ ", "OwO what's this? ", ">.< "]
+SUFFIXES = [" ʕ•ᴥ•ʔ", " ( ͡° ᴥ ͡°)", " (´・ω・｀)", " ;-;", " >_<", " ._.", " ^_^", " (• o •)", " (•́︿•̀)", " ( ´•̥̥̥ω•̥̥̥` )", " :D", " ◠‿◠✿)", " (✿ ♡‿♡)", " :3", " °○°/", " UwU", " :P", " (ʘᗩʘ')", " ( ˘ ³˘)♥", " (人◕ω◕)", " (；ω；)", " :O"]
+
+STUTTER_CHANCE = 0.3
+
+WORD_PATTERN = re.compile(r"\b(?:" + "|".join(map(re.escape, WORD_MAP)) + r")\b", re.IGNORECASE)
+RL_TABLE = str.maketrans("rlRL", "wwWW")
+N_PATTERN = re.compile(r"n(?!n|\b)|N(?!\b)")
+FIRST_WORD_PATTERN = re.compile(r"\w+")
+
+
+def uwuify(message: str, rng: random.Random = None) -> str:
+    """UwU-ifies a message. Pass a seeded random.Random for repeatable output."""
+    rng = rng or random
+
+    message = WORD_PATTERN.sub(lambda m: WORD_MAP[m.group().lower()], message)
+    message = message.translate(RL_TABLE)
+    message = N_PATTERN.sub(lambda m: m.group() + "y", message)
+
+    if rng.random() < STUTTER_CHANCE:
+        match = FIRST_WORD_PATTERN.match(message)
+        if match:
+            first_word = match.group()
+            stuttered = f"{first_word[0]}-{first_word}"
+            message = message.replace(first_word, stuttered, 1)
+
+    return rng.choice(PREFIXES) + message + rng.choice(SUFFIXES)
+
+
+if __name__ == "__main__":
+    # Benchmark: python uwuify.py
+    import time
+
+    short = "Hey, I love this server! Hi everyone, nice to meet you."
+    long = (short + " ") * (2000 // (len(short) + 1))
+
+    for label, text in (("short", short), ("2,000 chars", long)):
+        rng = random.Random(0)
+        runs = 20000 if label == "short" else 500
+        start = time.perf_counter()
+        for _ in range(runs):
+            uwuify(text, rng)
+        elapsed = (time.perf_counter() - start) / runs
+        print(f"{label:>12}: {elapsed * 1e6:8.1f} us/call")
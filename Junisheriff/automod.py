@@ -1,7 +1,10 @@
 import discord
+import asyncio
+import os
 import re
+import time
 import datetime
-from safebrowsing import is_phishing_link
+from safebrowsing import find_phishing_links
 
 # ==================================
 # CONFIGURATION
@@ -29,6 +32,14 @@ ALLOWED_GIF_DOMAINS = [
 ]
 
 SLUR_LIST_FILE = "slurs.txt"
+# How often (in seconds) the slur file is checked for edits
+SLUR_RELOAD_CHECK_SECONDS = 5
+
+# Network checks (phishing lookups) that take longer than this are treated as clean
+NETWORK_CHECK_DEADLINE_SECONDS = 3
+
+# How often (in seconds) a summary of per-check timings is printed; 0 turns the report off
+TIMING_REPORT_SECONDS = 3600
 
 # ==================================
 # BOT HOOKUP
@@ -36,6 +47,15 @@ SLUR_LIST_FILE = "slurs.txt"
 
 bot = None
 
+# Compiled slur pattern and the (mtime, inode, size) of the file it was built from
+slur_pattern = None
+slur_file_state = None
+slur_last_checked = 0.0
+
+# check name -> [runs, total seconds, slowest seconds], reset after every report
+check_timings = {}
+timing_report_task = None
+
 def set_bot(bot_instance):
     global bot
     bot = bot_instance
@@ -52,13 +72,7 @@ def setup_automod(bot_instance: discord.Client):
         if message.guild.id != SERVER_ID:
             return
 
-        if await check_phishing(message):
-            return
-
-        if await check_no_links_in_general(message):
-            return
-
-        if await check_slurs(message):
+        if await run_automod(message):
             return
 
         await bot.process_commands(message)
@@ -79,9 +93,37 @@ def load_slurs(filename=SLUR_LIST_FILE):
         return []
 
 
-def is_slur_in_text(text, slur):
-    pattern = r'\b' + re.escape(slur) + r'\b'
-    return re.search(pattern, text, re.IGNORECASE)
+def compile_slur_pattern(slurs):
+    if not slurs:
+        return None
+    # Longest first so a slur that prefixes another can't shadow it
+    alternation = "|".join(re.escape(slur) for slur in sorted(set(slurs), key=len, reverse=True))
+    return re.compile(r'\b(?:' + alternation + r')\b', re.IGNORECASE)
+
+
+def get_slur_pattern(filename=SLUR_LIST_FILE):
+    """
+    Returns the compiled slur pattern, rebuilding it only when the slur file
+    has been edited or replaced since it was last loaded.
+    """
+    global slur_pattern, slur_file_state, slur_last_checked
+
+    now = time.monotonic()
+    if slur_file_state is not None and now - slur_last_checked < SLUR_RELOAD_CHECK_SECONDS:
+        return slur_pattern
+    slur_last_checked = now
+
+    try:
+        st = os.stat(filename)
+        state = (st.st_mtime_ns, st.st_ino, st.st_size)
+    except FileNotFoundError:
+        state = ()
+
+    if state != slur_file_state:
+        slur_pattern = compile_slur_pattern(load_slurs(filename))
+        slur_file_state = state
+
+    return slur_pattern
 
 
 def safe_avatar_url(user):
@@ -94,100 +136,169 @@ async def log_event(channel_id: int, embed: discord.Embed):
         await channel.send(embed=embed)
 
 
+# -------- Pipeline --------
+
+class Verdict:
+    """Result of a check that wants the message removed. log_reason is None for silent deletes."""
+
+    def __init__(self, check: str, log_reason: str = None):
+        self.check = check
+        self.log_reason = log_reason
+
+
+def record_timing(name: str, elapsed: float):
+    stats = check_timings.setdefault(name, [0, 0.0, 0.0])
+    stats[0] += 1
+    stats[1] += elapsed
+    stats[2] = max(stats[2], elapsed)
+
+
+def timing_summary() -> str:
+    """One line per check, the one taking the most time overall first."""
+    overall = sum(total for _, total, _ in check_timings.values()) or 1.0
+    lines = []
+    for name, (runs, total, slowest) in sorted(check_timings.items(), key=lambda item: item[1][1], reverse=True):
+        lines.append(
+            f"{name}: {runs} runs, avg {total / runs * 1000:.2f} ms, "
+            f"max {slowest * 1000:.2f} ms, {total / overall:.0%} of check time"
+        )
+    return "\n".join(lines)
+
+
+async def report_timings_forever():
+    while True:
+        await asyncio.sleep(TIMING_REPORT_SECONDS)
+        if check_timings:
+            print(f"[automod] Check timings for the last {TIMING_REPORT_SECONDS}s:\n{timing_summary()}")
+            check_timings.clear()
+
+
+def start_timing_reports():
+    global timing_report_task
+    if TIMING_REPORT_SECONDS and (timing_report_task is None or timing_report_task.done()):
+        timing_report_task = asyncio.create_task(report_timings_forever())
+
+
+async def timed_network_check(check, message):
+    start = time.perf_counter()
+    try:
+        return await check(message)
+    finally:
+        record_timing(check.__name__, time.perf_counter() - start)
+
+
+async def run_automod(message: discord.Message) -> bool:
+    """
+    Runs the cheap local checks first, then the network checks concurrently under a deadline.
+    The first verdict found is applied once; returns True if the message was removed.
+    """
+    for check in LOCAL_CHECKS:
+        start = time.perf_counter()
+        verdict = check(message)
+        record_timing(check.__name__, time.perf_counter() - start)
+        if verdict:
+            await apply_verdict(message, verdict)
+            return True
+
+    pending = {asyncio.create_task(timed_network_check(check, message)) for check in NETWORK_CHECKS}
+    deadline = time.monotonic() + NETWORK_CHECK_DEADLINE_SECONDS
+    verdict = None
+
+    try:
+        while pending and verdict is None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                print(f"[automod] Network checks timed out for message {message.id}")
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception():
+                    print(f"[automod] Check failed: {task.exception()}")
+                elif task.result():
+                    verdict = task.result()
+                    break
+    finally:
+        for task in pending:
+            task.cancel()
+
+    if verdict:
+        await apply_verdict(message, verdict)
+        return True
+
+    return False
+
+
+async def apply_verdict(message: discord.Message, verdict: Verdict):
+    if verdict.log_reason:
+        embed = discord.Embed(
+            title="Message Auto-deleted",
+            description=(
+                f"**Message by {message.author.mention} deleted in "
+                f"{message.channel.mention} due to {verdict.log_reason}**\n\n"
+                f"{message.content}"
+            ),
+            color=discord.Color.from_str("#99FCFF")
+        )
+        embed.set_author(
+            name=str(message.author),
+            icon_url=safe_avatar_url(message.author)
+        )
+        embed.timestamp = datetime.datetime.now(datetime.timezone.utc)
+
+        await log_event(LOG_CHANNEL_ID, embed)
+
+    try:
+        await message.delete()
+    except discord.NotFound:
+        print(f"[automod] Message {message.id} already deleted.")
+
+
 # -------- Checks --------
 
-async def check_no_links_in_general(message: discord.Message):
+def check_no_links_in_general(message: discord.Message):
 
     if message.channel.id not in (NO_LINKS_CHANNEL_ID, GIF_ONLY_CHANNEL_ID):
-        return False
+        return None
 
     if any(role.id in ADMIN_ROLE_IDS for role in message.author.roles):
-        return False
+        return None
 
     urls = re.findall(r'https?://\S+', message.content)
     if not urls:
-        return False
+        return None
 
     if message.channel.id == NO_LINKS_CHANNEL_ID:
-        try:
-            await message.delete()
-        except discord.NotFound:
-            pass
-        return True
+        return Verdict("no_links")
 
     if message.channel.id == GIF_ONLY_CHANNEL_ID:
         for url in urls:
             if any(domain in url for domain in ALLOWED_GIF_DOMAINS):
                 continue
-            try:
-                await message.delete()
-            except discord.NotFound:
-                pass
-            return True
+            return Verdict("gif_only")
 
-    return False
+    return None
 
-async def check_slurs(message):
+def check_slurs(message):
     content = message.content.lower()
-    now = datetime.datetime.now(datetime.timezone.utc)
-
-    for slur in load_slurs():  # dynamically reload list
-        if is_slur_in_text(content, slur):
-            embed = discord.Embed(
-                title="Message Auto-deleted",
-                description=(
-                    f"**Message by {message.author.mention} deleted in "
-                    f"{message.channel.mention} due to bad word detected**\n\n"
-                    f"{message.content}"
-                ),
-                color=discord.Color.from_str("#99FCFF")
-            )
-            embed.set_author(
-                name=str(message.author),
-                icon_url=safe_avatar_url(message.author)
-            )
-            embed.timestamp = now
-
-            await log_event(LOG_CHANNEL_ID, embed)
-            await message.delete()
-            return True
 
-    return False
+    pattern = get_slur_pattern()  # reloaded when slurs.txt changes
+    if pattern and pattern.search(content):
+        return Verdict("slurs", "bad word detected")
+
+    return None
 
 
 async def check_phishing(message):
     urls = re.findall(r'https?://\S+', message.content)
-    now = datetime.datetime.now(datetime.timezone.utc)
-
-    for url in urls:
-        if await is_phishing_link(url):
-            embed = discord.Embed(
-                title="Message Auto-deleted",
-                description=(
-                    f"**Message by {message.author.mention} deleted in "
-                    f"{message.channel.mention} due to phishing or dangerous "
-                    f"link detected**\n\n{message.content}"
-                ),
-                color=discord.Color.from_str("#99FCFF")
-            )
-            embed.set_author(
-                name=str(message.author),
-                icon_url=safe_avatar_url(message.author)
-            )
-            embed.timestamp = now
-
-            await log_event(LOG_CHANNEL_ID, embed)
-
-            try:
-                await message.delete()
-            except discord.NotFound:
-                print(f"[automod] Message {message.id} already deleted.")
-
-            return True
-
-    return False
-
+    if not urls:
+        return None
 
+    if await find_phishing_links(urls):
+        return Verdict("phishing", "phishing or dangerous link detected")
 
+    return None
 
 
+# Pure-CPU checks run first and in order; network checks run concurrently afterwards
+LOCAL_CHECKS = (check_no_links_in_general, check_slurs)
+NETWORK_CHECKS = (check_phishing,)
@@ -1,8 +1,8 @@
 import discord
 from discord import Member, app_commands
-import asyncio
 import re
 from datetime import datetime, timedelta, timezone
+from expiry import schedule_role_removal, cancel_role_removal
 
 # ========================================
 # CONFIGURATION
@@ -95,8 +95,7 @@ async def piss_on(interaction: discord.Interaction, user: Member):
     embed = base_embed(f"{PISS_EMOJI} {user.mention} has been pissed on")
     await interaction.response.send_message(embed=embed, allowed_mentions=discord.AllowedMentions(roles=True))
 
-    await asyncio.sleep(PISS_DURATION_SECONDS)
-    await user.remove_roles(piss_role)
+    await schedule_role_removal(user, piss_role, PISS_DURATION_SECONDS)
 
 
 @app_commands.command(name="foot", description="Add the foot role")
@@ -121,8 +120,7 @@ async def give_foot(interaction: discord.Interaction, user: Member):
     )
     await interaction.response.send_message(embed=embed, allowed_mentions=discord.AllowedMentions(roles=True))
 
-    await asyncio.sleep(FOOT_DURATION_SECONDS)
-    await user.remove_roles(foot_role)
+    await schedule_role_removal(user, foot_role, FOOT_DURATION_SECONDS)
 
 
 @app_commands.command(name="snatch", description="Make someone bald")
@@ -171,6 +169,7 @@ async def mop(interaction: discord.Interaction, user: Member):
 
     if piss_role in user.roles:
         await user.remove_roles(piss_role)
+        await cancel_role_removal(interaction.guild.id, user.id, PISS_ROLE_ID)
         await interaction.response.send_message(embed=embed, allowed_mentions=discord.AllowedMentions(roles=True))
     else:
         await interaction.response.send_message(f"{user.mention} doesn't have the piss role.", ephemeral=True)
@@ -188,6 +187,7 @@ async def sock(interaction: discord.Interaction, user: Member):
 
     if foot_role in user.roles:
         await user.remove_roles(foot_role)
+        await cancel_role_removal(interaction.guild.id, user.id, FOOT_ROLE_ID)
         await interaction.response.send_message(embed=embed, allowed_mentions=discord.AllowedMentions(roles=True))
     else:
         await interaction.response.send_message(f"{user.mention} doesn't have the foot role.", ephemeral=True)
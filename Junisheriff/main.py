@@ -9,7 +9,9 @@ import urllib.parse
 from mod import set_bot as set_warn_bot, mod_group
 from log import setup_logging
 from funwarns import setup_funwarns
-from automod import setup_automod
+from automod import setup_automod, start_timing_reports
+from expiry import set_bot as set_expiry_bot, start_expiry_scheduler
+from safebrowsing import close_session as close_safebrowsing_session, start_local_database
 
 class Client(commands.Bot):
     def __init__(self, **kwargs):
@@ -29,6 +31,9 @@ class Client(commands.Bot):
             autocommit=True,
         )
         
+        start_local_database()
+        start_expiry_scheduler()
+        start_timing_reports()
         setup_funwarns(self)
         self.tree.add_command(mod_group)
         await self.tree.sync()
@@ -36,6 +41,10 @@ class Client(commands.Bot):
     async def on_ready(self):
         print(f'Logged on as {self.user}')
 
+    async def close(self):
+        await close_safebrowsing_session()
+        await super().close()
+
 intents = discord.Intents.default()
 intents.message_content = True
 intents.members = True
@@ -43,6 +52,7 @@ intents.voice_states = True
 bot = Client(command_prefix="?", intents=intents)
 
 set_warn_bot(bot)
+set_expiry_bot(bot)
 setup_logging(bot)
 setup_automod(bot)
 
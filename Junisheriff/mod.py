@@ -5,7 +5,7 @@ from datetime import timezone
 import aiomysql
 from zoneinfo import ZoneInfo
 import re
-import asyncio
+from expiry import schedule_role_removal, cancel_role_removal
 
 # ============================================
 # CONFIGURATION
@@ -619,9 +619,8 @@ async def mute(interaction: discord.Interaction, user: discord.Member, reason: s
         return
 
     try:
-        sleep_seconds = parse_duration(duration)
-        await asyncio.sleep(sleep_seconds)
-        await user.remove_roles(gag_role)
+        mute_seconds = parse_duration(duration)
+        await schedule_role_removal(user, gag_role, mute_seconds)
     except ValueError as e:
         await interaction.followup.send(str(e), ephemeral=True)
 
@@ -633,6 +632,7 @@ async def unmute(interaction: discord.Interaction, user: discord.Member):
 
     if gag_role in user.roles:
         await user.remove_roles(gag_role)
+        await cancel_role_removal(interaction.guild.id, user.id, GAG_ROLE_ID)
 
         embed = discord.Embed(
             description=f"{user.mention} has been unmuted.",
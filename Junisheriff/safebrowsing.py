@@ -1,31 +1,537 @@
 import aiohttp
+import asyncio
+import base64
+import bisect
+import hashlib
+import json
 import os
+import posixpath
+import re
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlunsplit, unquote_to_bytes
 
 from dotenv import load_dotenv
 load_dotenv()
 
 GOOGLE_API_KEY = os.getenv("GOOGLE_SAFE_BROWSING_API_KEY")
 
-async def is_phishing_link(url: str) -> bool:
-    api_url = f"https://safebrowsing.googleapis.com/v4/threatMatches:find?key={GOOGLE_API_KEY}"
+API_BASE = os.getenv("SAFE_BROWSING_API_BASE", "https://safebrowsing.googleapis.com/v4")
+API_URL = f"{API_BASE}/threatMatches:find"
+UPDATE_URL = f"{API_BASE}/threatListUpdates:fetch"
+FULL_HASHES_URL = f"{API_BASE}/fullHashes:find"
+
+CLIENT_INFO = {
+    "clientId": "junisheriff-bot",
+    "clientVersion": "1.0"
+}
+
+# "lookup" asks Google about every unseen URL. "update" keeps a local copy of the
+# hash-prefix lists and only asks Google when a URL's hash matches a local prefix.
+MODE = os.getenv("SAFE_BROWSING_MODE", "lookup")
+LOCAL_DB_FILE = "safebrowsing_db.json"
+
+THREAT_TYPES = ["MALWARE", "SOCIAL_ENGINEERING", "POTENTIALLY_HARMFUL_APPLICATION"]
+
+# Verdicts are cached per normalized URL so a link spammed during a raid is only looked up once
+VERDICT_CACHE_TTL_SECONDS = 1800
+VERDICT_CACHE_MAX_SIZE = 10000
+
+REQUEST_TIMEOUT_SECONDS = 5
+
+session = None
+verdict_cache = OrderedDict()  # url -> (expires_at, is_unsafe)
+pending_lookups = {}  # url -> Future resolving to is_unsafe
+
+
+def get_session() -> aiohttp.ClientSession:
+    global session
+    if session is None or session.closed:
+        session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT_SECONDS),
+            connector=aiohttp.TCPConnector(limit=10, ttl_dns_cache=300),
+        )
+    return session
+
+
+async def close_session():
+    global session
+    if session is not None and not session.closed:
+        await session.close()
+    session = None
+
 
+def normalize_url(url: str) -> str:
+    """Lowercases the scheme and host and drops the fragment so trivial variations share a cache entry."""
+    url = url.strip().rstrip(">)]}.,!?'\"")
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return url
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or "/", parts.query, ""))
+
+
+def get_cached_verdict(url: str):
+    entry = verdict_cache.get(url)
+    if entry is None:
+        return None
+    expires_at, is_unsafe = entry
+    if expires_at < time.monotonic():
+        del verdict_cache[url]
+        return None
+    verdict_cache.move_to_end(url)
+    return is_unsafe
+
+
+def cache_verdict(url: str, is_unsafe: bool):
+    verdict_cache[url] = (time.monotonic() + VERDICT_CACHE_TTL_SECONDS, is_unsafe)
+    verdict_cache.move_to_end(url)
+    while len(verdict_cache) > VERDICT_CACHE_MAX_SIZE:
+        verdict_cache.popitem(last=False)
+
+
+async def lookup_urls(urls: list) -> set:
+    """Sends one threatMatches:find request for every URL and returns the ones Google flagged."""
     payload = {
-        "client": {
-            "clientId": "junisheriff-bot",
-            "clientVersion": "1.0"
-        },
+        "client": CLIENT_INFO,
         "threatInfo": {
-            "threatTypes": ["MALWARE", "SOCIAL_ENGINEERING", "POTENTIALLY_HARMFUL_APPLICATION"],
+            "threatTypes": THREAT_TYPES,
             "platformTypes": ["ANY_PLATFORM"],
             "threatEntryTypes": ["URL"],
-            "threatEntries": [{"url": url}]
+            "threatEntries": [{"url": url} for url in urls]
         }
     }
 
-    async with aiohttp.ClientSession() as session:
-        async with session.post(api_url, json=payload) as response:
-            if response.status != 200:
-                print(f"[SafeBrowsing] API error: {response.status}")
+    async with get_session().post(API_URL, params={"key": GOOGLE_API_KEY}, json=payload) as response:
+        if response.status != 200:
+            print(f"[SafeBrowsing] API error: {response.status}")
+            return None
+        data = await response.json()
+
+    return {match["threat"]["url"] for match in data.get("matches", [])}
+
+
+async def find_phishing_links(urls: list) -> set:
+    """
+    Returns the subset of urls that are flagged as unsafe.
+    Cached verdicts are reused, URLs already being looked up by another message are awaited,
+    and everything else goes to Google in a single batched request.
+    """
+    normalized = {url: normalize_url(url) for url in urls}
+    unsafe = set()
+    waiting = {}
+    to_lookup = []
+
+    for url, key in normalized.items():
+        verdict = get_cached_verdict(key)
+        if verdict is not None:
+            if verdict:
+                unsafe.add(url)
+        elif key in pending_lookups:
+            waiting[url] = pending_lookups[key]
+        elif key not in to_lookup:
+            to_lookup.append(key)
+
+    if to_lookup:
+        loop = asyncio.get_running_loop()
+        futures = {key: loop.create_future() for key in to_lookup}
+        pending_lookups.update(futures)
+        flagged = None
+        try:
+            if MODE == "update" and local_db.ready:
+                flagged = await local_db.check_urls(to_lookup)
+            else:
+                flagged = await lookup_urls(to_lookup)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"[SafeBrowsing] Request failed: {e}")
+        finally:
+            # Always resolve, so messages waiting on these URLs never hang
+            for key, future in futures.items():
+                pending_lookups.pop(key, None)
+                # API errors count as safe, like before, but aren't cached
+                is_unsafe = flagged is not None and key in flagged
+                if flagged is not None:
+                    cache_verdict(key, is_unsafe)
+                future.set_result(is_unsafe)
+
+        for url, key in normalized.items():
+            if key in futures and futures[key].result():
+                unsafe.add(url)
+
+    for url, future in waiting.items():
+        if await asyncio.shield(future):
+            unsafe.add(url)
+
+    return unsafe
+
+
+async def is_phishing_link(url: str) -> bool:
+    return bool(await find_phishing_links([url]))
+
+
+# ==================================
+# UPDATE API MODE
+# ==================================
+
+def percent_unescape(value: bytes) -> bytes:
+    """Unescapes repeatedly until nothing changes, so %2525 and friends collapse fully."""
+    while True:
+        unescaped = unquote_to_bytes(value)
+        if unescaped == value:
+            return value
+        value = unescaped
+
+
+def percent_escape(value: bytes) -> str:
+    """Escapes control characters, space, non-ASCII bytes, '#' and '%', and nothing else."""
+    return "".join(
+        f"%{b:02X}" if b <= 0x20 or b >= 0x7F or b in b"#%" else chr(b)
+        for b in value
+    )
+
+
+def canonicalize_url(url: str) -> tuple:
+    """
+    Canonicalizes a URL as described by the Safe Browsing v4 docs and returns (host, path, query),
+    with query None when the URL has no '?'. Returns None if the URL has no usable host.
+    The URL is split into host, path and query before anything is unescaped, so an encoded
+    %23, %3F or %2F stays part of the component it was found in.
+    """
+    url = re.sub(r"[\t\r\n]", "", url.strip())
+    # Characters up to U+00FF stand for the byte of the same value, as in the docs' test vectors
+    raw = url.encode("latin-1") if all(ord(c) < 256 for c in url) else url.encode("utf-8")
+
+    raw = raw.split(b"#", 1)[0]
+    scheme = re.match(rb"[A-Za-z][A-Za-z0-9+.\-]*://", raw)
+    if scheme:
+        raw = raw[scheme.end():]
+
+    authority, sep, rest = re.match(rb"([^/?]*)(.?)(.*)", raw, re.DOTALL).groups()
+    rest = sep + rest
+    if b"?" in rest:
+        path, query = rest.split(b"?", 1)
+    else:
+        path, query = rest, None
+
+    # Host: drop credentials and port, then unescape and normalize
+    host = authority.rsplit(b"@", 1)[-1]
+    host = re.sub(rb":\d*$", b"", host)
+    host = percent_unescape(host).lower().strip(b".")
+    host = re.sub(rb"\.{2,}", b".", host)
+    if not host:
+        return None
+    if re.fullmatch(rb"\d+", host):
+        try:
+            host = ".".join(str(b) for b in int(host).to_bytes(4, "big")).encode()
+        except OverflowError:
+            pass
+
+    # Path: unescape, then resolve "/./", "/../" and runs of slashes
+    path = percent_unescape(path) or b"/"
+    if not path.startswith(b"/"):
+        path = b"/" + path
+    trailing_slash = path.endswith(b"/") or path.endswith(b"/.") or path.endswith(b"/..")
+    path = posixpath.normpath(re.sub(rb"/{2,}", b"/", path))
+    if trailing_slash and not path.endswith(b"/"):
+        path += b"/"
+
+    if query is not None:
+        query = percent_escape(percent_unescape(query))
+    return percent_escape(host), percent_escape(path), query
+
+
+def url_expressions(url: str) -> list:
+    """Every host-suffix / path-prefix expression that the Safe Browsing lists may contain for a URL."""
+    canonical = canonicalize_url(url)
+    if canonical is None:
+        return []
+    host, path, query = canonical
+
+    hosts = [host]
+    if not re.fullmatch(r"[\d.]+", host):
+        components = host.split(".")
+        # Up to 4 additional hosts formed from the last 5 components, dropping the leading one each time
+        for i in range(max(1, len(components) - 5), len(components) - 1):
+            hosts.append(".".join(components[i:]))
+
+    paths = []
+    if query is not None:
+        paths.append(f"{path}?{query}")
+    paths.append(path)
+    prefix = "/"
+    paths.append(prefix)
+    segments = path.strip("/").split("/")
+    if not path.endswith("/"):
+        segments = segments[:-1]  # the last component is a file, not a directory
+    for segment in segments[:3]:
+        if not segment:
+            break
+        prefix += segment + "/"
+        paths.append(prefix)
+
+    expressions = []
+    for h in hosts:
+        for p in dict.fromkeys(paths):
+            expression = h + p
+            if expression not in expressions:
+                expressions.append(expression)
+    return expressions
+
+
+class LocalThreatDatabase:
+    """
+    Local copy of the Safe Browsing hash-prefix lists.
+    Each list keeps its prefixes in one sorted list (the order the API's removal indices refer to).
+    """
+
+    def __init__(self, path: str = LOCAL_DB_FILE):
+        self.path = path
+        self.lists = {}  # (threatType, platformType, threatEntryType) -> {"state": str, "prefixes": [bytes]}
+        self.ready = False
+        self.next_update_at = 0.0
+        # Full-hash lookup results, as returned by fullHashes:find
+        self.full_hash_cache = {}  # full hash -> (expires_at, is_unsafe)
+        self.negative_prefix_cache = {}  # prefix -> expires_at
+        self.update_task = None
+
+    # -------- Persistence --------
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (json.JSONDecodeError, ValueError):
+            print(f"[SafeBrowsing] {self.path} is invalid, starting from an empty database.")
+            return
+
+        for entry in data.get("lists", []):
+            prefixes = []
+            for size, blob in entry["prefixes"]:
+                raw = base64.b64decode(blob)
+                prefixes.extend(raw[i:i + size] for i in range(0, len(raw), size))
+            prefixes.sort()
+            self.lists[tuple(entry["key"])] = {"state": entry["state"], "prefixes": prefixes}
+
+        self.ready = bool(self.lists)
+
+    def serialize(self) -> str:
+        lists = []
+        for key, entry in self.lists.items():
+            by_size = {}
+            for prefix in entry["prefixes"]:
+                by_size.setdefault(len(prefix), []).append(prefix)
+            lists.append({
+                "key": list(key),
+                "state": entry["state"],
+                "prefixes": [
+                    [size, base64.b64encode(b"".join(chunk)).decode()]
+                    for size, chunk in by_size.items()
+                ],
+            })
+        return json.dumps({"lists": lists})
+
+    def write(self, data: str):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    async def save(self):
+        await asyncio.to_thread(self.write, self.serialize())
+
+    # -------- Syncing --------
+
+    def apply_update(self, update: dict) -> bool:
+        key = (update["threatType"], update["platformType"], update["threatEntryType"])
+        entry = self.lists.get(key)
+
+        if entry is None or update.get("responseType") == "FULL_UPDATE":
+            prefixes = []
+        else:
+            prefixes = entry["prefixes"]
+
+        removed = set()
+        for removal in update.get("removals", []):
+            removed.update(removal.get("rawIndices", {}).get("indices", []))
+        if removed:
+            prefixes = [p for i, p in enumerate(prefixes) if i not in removed]
+
+        added = []
+        for addition in update.get("additions", []):
+            raw_hashes = addition.get("rawHashes")
+            if not raw_hashes:
+                continue
+            size = raw_hashes["prefixSize"]
+            raw = base64.b64decode(raw_hashes["rawHashes"])
+            added.extend(raw[i:i + size] for i in range(0, len(raw), size))
+        if added:
+            prefixes = sorted(prefixes + added)
+
+        expected = update.get("checksum", {}).get("sha256")
+        if expected:
+            actual = base64.b64encode(hashlib.sha256(b"".join(prefixes)).digest()).decode()
+            if actual != expected:
+                # Out of sync: drop the list so the next update is a full one
+                print(f"[SafeBrowsing] Checksum mismatch for {key}, resetting list.")
+                self.lists.pop(key, None)
                 return False
+
+        self.lists[key] = {"state": update.get("newClientState", ""), "prefixes": prefixes}
+        return True
+
+    async def update(self):
+        payload = {
+            "client": CLIENT_INFO,
+            "listUpdateRequests": [
+                {
+                    "threatType": threat_type,
+                    "platformType": "ANY_PLATFORM",
+                    "threatEntryType": "URL",
+                    "state": self.lists.get((threat_type, "ANY_PLATFORM", "URL"), {}).get("state", ""),
+                    "constraints": {"supportedCompressions": ["RAW"]},
+                }
+                for threat_type in THREAT_TYPES
+            ],
+        }
+
+        async with get_session().post(UPDATE_URL, params={"key": GOOGLE_API_KEY}, json=payload) as response:
+            if response.status != 200:
+                print(f"[SafeBrowsing] Update error: {response.status}")
+                self.next_update_at = time.monotonic() + 300
+                return
             data = await response.json()
-            return bool(data.get("matches"))
\ No newline at end of file
+
+        for update in data.get("listUpdateResponses", []):
+            self.apply_update(update)
+
+        self.ready = bool(self.lists)
+        self.next_update_at = time.monotonic() + parse_duration(data.get("minimumWaitDuration"), 1800)
+        await self.save()
+
+    async def update_forever(self):
+        while True:
+            try:
+                await self.update()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"[SafeBrowsing] Update failed: {e}")
+                self.next_update_at = time.monotonic() + 300
+            except Exception as e:
+                # A malformed response or a failed save must not end the task, or the lists go stale for good
+                print(f"[SafeBrowsing] Update failed unexpectedly: {type(e).__name__}: {e}")
+                self.next_update_at = time.monotonic() + 300
+            await asyncio.sleep(max(1.0, self.next_update_at - time.monotonic()))
+
+    def start(self):
+        self.load()
+        if self.update_task is None or self.update_task.done():
+            self.update_task = asyncio.create_task(self.update_forever())
+
+    # -------- Lookups --------
+
+    def matching_prefixes(self, full_hash: bytes) -> set:
+        matches = set()
+        for entry in self.lists.values():
+            prefixes = entry["prefixes"]
+            i = bisect.bisect_right(prefixes, full_hash) - 1
+            # Every prefix of full_hash sorts at or before it and shares its first 4 bytes
+            while i >= 0 and prefixes[i][:4] == full_hash[:4]:
+                if full_hash.startswith(prefixes[i]):
+                    matches.add(prefixes[i])
+                i -= 1
+        return matches
+
+    async def check_urls(self, urls: list) -> set:
+        """Returns the URLs whose expressions match a full hash confirmed unsafe by Google, or None on API errors."""
+        now = time.monotonic()
+        url_hashes = {
+            url: [hashlib.sha256(e.encode()).digest() for e in url_expressions(url)]
+            for url in urls
+        }
+
+        unsafe = set()
+        unresolved = {}  # full hash -> matching prefixes
+        for url, hashes in url_hashes.items():
+            for full_hash in hashes:
+                cached = self.full_hash_cache.get(full_hash)
+                if cached and cached[0] > now:
+                    if cached[1]:
+                        unsafe.add(url)
+                    continue
+
+                prefixes = {
+                    p for p in self.matching_prefixes(full_hash)
+                    if self.negative_prefix_cache.get(p, 0) <= now
+                }
+                if prefixes:
+                    unresolved[full_hash] = prefixes
+
+        if not unresolved:
+            return unsafe
+
+        confirmed = await self.find_full_hashes({p for ps in unresolved.values() for p in ps})
+        if confirmed is None:
+            return None
+        for url, hashes in url_hashes.items():
+            if any(h in confirmed for h in hashes):
+                unsafe.add(url)
+        return unsafe
+
+    async def find_full_hashes(self, prefixes: set) -> set:
+        payload = {
+            "client": CLIENT_INFO,
+            "clientStates": [entry["state"] for entry in self.lists.values()],
+            "threatInfo": {
+                "threatTypes": THREAT_TYPES,
+                "platformTypes": ["ANY_PLATFORM"],
+                "threatEntryTypes": ["URL"],
+                "threatEntries": [{"hash": base64.b64encode(p).decode()} for p in prefixes],
+            },
+        }
+
+        async with get_session().post(FULL_HASHES_URL, params={"key": GOOGLE_API_KEY}, json=payload) as response:
+            if response.status != 200:
+                print(f"[SafeBrowsing] fullHashes error: {response.status}")
+                return None
+            data = await response.json()
+
+        now = time.monotonic()
+        confirmed = set()
+        for match in data.get("matches", []):
+            full_hash = base64.b64decode(match["threat"]["hash"])
+            confirmed.add(full_hash)
+            self.full_hash_cache[full_hash] = (now + parse_duration(match.get("cacheDuration"), 300), True)
+
+        negative_until = now + parse_duration(data.get("negativeCacheDuration"), 300)
+        for prefix in prefixes:
+            self.negative_prefix_cache[prefix] = negative_until
+
+        # Drop expired entries so the caches don't grow forever
+        if len(self.negative_prefix_cache) > VERDICT_CACHE_MAX_SIZE:
+            self.negative_prefix_cache = {p: t for p, t in self.negative_prefix_cache.items() if t > now}
+        if len(self.full_hash_cache) > VERDICT_CACHE_MAX_SIZE:
+            self.full_hash_cache = {h: v for h, v in self.full_hash_cache.items() if v[0] > now}
+
+        return confirmed
+
+
+def parse_duration(value, default: float) -> float:
+    """Parses durations like "300.5s" from the API."""
+    if not value:
+        return default
+    try:
+        return float(str(value).rstrip("s"))
+    except ValueError:
+        return default
+
+
+local_db = LocalThreatDatabase()
+
+
+def start_local_database():
+    """Starts syncing the local hash-prefix database if SAFE_BROWSING_MODE is "update"."""
+    if MODE == "update":
+        local_db.start()
@@ -0,0 +1,262 @@
+import asyncio
+import base64
+import hashlib
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+import safebrowsing
+from safebrowsing import LocalThreatDatabase, canonicalize_url, url_expressions
+
+
+# Canonicalization test vectors from the Safe Browsing v4 docs (scheme left out, since
+# canonicalize_url returns host, path and query)
+CANONICALIZATION_VECTORS = [
+    ("http://host/%25%32%35", "host/%25"),
+    ("http://host/%25%32%35%25%32%35", "host/%25%25"),
+    ("http://host/%2525252525252525", "host/%25"),
+    ("http://host/asdf%25%32%35asd", "host/asdf%25asd"),
+    ("http://host/%%%25%32%35asd%%", "host/%25%25%25asd%25%25"),
+    ("http://www.google.com/", "www.google.com/"),
+    ("http://%31%36%38%2e%31%38%38%2e%39%39%2e%32%36/%2E%73%65%63%75%72%65/%77%77%77%2E%65%62%61%79%2E%63%6F%6D/",
+     "168.188.99.26/.secure/www.ebay.com/"),
+    ("http://195.127.0.11/uploads/%20%20%20%20/.verify/.eBaysecure=updateuserdataxplimnbqmn-xplmvalidateinfoswqpcmlx=hgplmcx/",
+     "195.127.0.11/uploads/%20%20%20%20/.verify/.eBaysecure=updateuserdataxplimnbqmn-xplmvalidateinfoswqpcmlx=hgplmcx/"),
+    ("http://host%23.com/%257Ea%2521b%2540c%2523d%2524e%25f%255E00%252611%252A22%252833%252944_55%252B",
+     "host%23.com/~a!b@c%23d$e%25f^00&11*22(33)44_55+"),
+    ("http://3279880203/blah", "195.127.0.11/blah"),
+    ("http://www.google.com/blah/..", "www.google.com/"),
+    ("www.google.com/", "www.google.com/"),
+    ("www.google.com", "www.google.com/"),
+    ("http://www.evil.com/blah#frag", "www.evil.com/blah"),
+    ("http://www.GOOgle.com/", "www.google.com/"),
+    ("http://www.google.com.../", "www.google.com/"),
+    ("http://www.google.com/foo\tbar\rbaz\n2", "www.google.com/foobarbaz2"),
+    ("http://www.google.com/q?", "www.google.com/q?"),
+    ("http://www.google.com/q?r?", "www.google.com/q?r?"),
+    ("http://www.google.com/q?r?s", "www.google.com/q?r?s"),
+    ("http://evil.com/foo#bar#baz", "evil.com/foo"),
+    ("http://evil.com/foo;", "evil.com/foo;"),
+    ("http://evil.com/foo?bar;", "evil.com/foo?bar;"),
+    ("http://\x01\x80.com/", "%01%80.com/"),
+    ("http://notrailingslash.com", "notrailingslash.com/"),
+    ("http://www.gotaport.com:1234/", "www.gotaport.com/"),
+    ("  http://www.google.com/  ", "www.google.com/"),
+    ("http:// leadingspace.com/", "%20leadingspace.com/"),
+    ("http://%20leadingspace.com/", "%20leadingspace.com/"),
+    ("%20leadingspace.com/", "%20leadingspace.com/"),
+    ("https://www.securesite.com/", "www.securesite.com/"),
+    ("http://host.com/ab%23cd", "host.com/ab%23cd"),
+    ("http://host.com//twoslashes?more//slashes", "host.com/twoslashes?more//slashes"),
+]
+
+
+@pytest.mark.parametrize("url, expected", CANONICALIZATION_VECTORS)
+def test_canonicalize_url(url, expected):
+    host, path, query = canonicalize_url(url)
+    assert host + path + ("?" + query if query is not None else "") == expected
+
+
+def test_url_expressions():
+    assert url_expressions("http://a.b.c/1/2.html?param=1") == [
+        "a.b.c/1/2.html?param=1",
+        "a.b.c/1/2.html",
+        "a.b.c/",
+        "a.b.c/1/",
+        "b.c/1/2.html?param=1",
+        "b.c/1/2.html",
+        "b.c/",
+        "b.c/1/",
+    ]
+
+
+# -------- Local stub of the Safe Browsing API --------
+
+EVIL_EXPRESSION = "evil.example/"
+EVIL_HASH = hashlib.sha256(EVIL_EXPRESSION.encode()).digest()
+EVIL_PREFIX = EVIL_HASH[:4]
+
+
+class StubSafeBrowsing:
+    """Serves canned responses for the three endpoints and records every request body."""
+
+    def __init__(self):
+        self.requests = {"update": [], "fullHashes": [], "find": []}
+        self.statuses = {}  # endpoint name -> HTTP status to answer with
+        self.update_response = {
+            "listUpdateResponses": [
+                {
+                    "threatType": threat_type,
+                    "platformType": "ANY_PLATFORM",
+                    "threatEntryType": "URL",
+                    "responseType": "FULL_UPDATE",
+                    "additions": [{"rawHashes": {"prefixSize": 4, "rawHashes": base64.b64encode(EVIL_PREFIX).decode()}}],
+                    "newClientState": "state-1",
+                    "checksum": {"sha256": base64.b64encode(hashlib.sha256(EVIL_PREFIX).digest()).decode()},
+                }
+                for threat_type in safebrowsing.THREAT_TYPES
+            ],
+            "minimumWaitDuration": "600s",
+        }
+
+        self.app = web.Application()
+        self.app.router.add_post("/v4/threatListUpdates:fetch", self.handler("update", lambda body: self.update_response))
+        self.app.router.add_post("/v4/fullHashes:find", self.handler("fullHashes", self.full_hashes))
+        self.app.router.add_post("/v4/threatMatches:find", self.handler("find", self.threat_matches))
+
+    def handler(self, name, respond):
+        async def handle(request):
+            body = await request.json()
+            self.requests[name].append(body)
+            status = self.statuses.get(name, 200)
+            if status != 200:
+                return web.json_response({"error": {"code": status}}, status=status)
+            return web.json_response(respond(body))
+        return handle
+
+    def full_hashes(self, body):
+        requested = {base64.b64decode(entry["hash"]) for entry in body["threatInfo"]["threatEntries"]}
+        matches = []
+        if EVIL_PREFIX in requested:
+            matches.append({
+                "threatType": "SOCIAL_ENGINEERING",
+                "threat": {"hash": base64.b64encode(EVIL_HASH).decode()},
+                "cacheDuration": "300s",
+            })
+        return {"matches": matches, "negativeCacheDuration": "300s"}
+
+    def threat_matches(self, body):
+        return {"matches": [
+            {"threat": {"url": entry["url"]}}
+            for entry in body["threatInfo"]["threatEntries"]
+            if "evil" in entry["url"]
+        ]}
+
+
+def run_with_stub(test):
+    """Runs test(stub) with the module's endpoints pointed at a local stub server."""
+    async def main():
+        stub = StubSafeBrowsing()
+        server = TestServer(stub.app)
+        await server.start_server()
+        base = str(server.make_url("/v4"))
+        patched = {
+            "GOOGLE_API_KEY": "test-key",
+            "API_URL": f"{base}/threatMatches:find",
+            "UPDATE_URL": f"{base}/threatListUpdates:fetch",
+            "FULL_HASHES_URL": f"{base}/fullHashes:find",
+        }
+        saved = {name: getattr(safebrowsing, name) for name in patched}
+        for name, value in patched.items():
+            setattr(safebrowsing, name, value)
+        safebrowsing.verdict_cache.clear()
+        try:
+            await test(stub)
+        finally:
+            for name, value in saved.items():
+                setattr(safebrowsing, name, value)
+            await safebrowsing.close_session()
+            await server.close()
+
+    asyncio.run(main())
+
+
+def test_local_database_update_and_lookup(tmp_path):
+    async def test(stub):
+        db = LocalThreatDatabase(path=str(tmp_path / "db.json"))
+        await db.update()
+        assert db.ready
+        assert all(entry["prefixes"] == [EVIL_PREFIX] for entry in db.lists.values())
+
+        # Only the URL whose hash matches a local prefix is sent to fullHashes:find
+        unsafe = await db.check_urls(["http://evil.example/login", "http://fine.example/"])
+        assert unsafe == {"http://evil.example/login"}
+        assert len(stub.requests["fullHashes"]) == 1
+
+        # The confirmed full hash is cached
+        assert await db.check_urls(["http://evil.example/other"]) == {"http://evil.example/other"}
+        assert len(stub.requests["fullHashes"]) == 1
+
+        # The saved database loads back with the same lists
+        reloaded = LocalThreatDatabase(path=db.path)
+        reloaded.load()
+        assert reloaded.lists == db.lists
+
+        # The next update sends the stored client state
+        await db.update()
+        states = {r["state"] for r in stub.requests["update"][-1]["listUpdateRequests"]}
+        assert states == {"state-1"}
+
+    run_with_stub(test)
+
+
+def test_full_hashes_error_is_not_cached_as_safe(tmp_path, monkeypatch):
+    async def test(stub):
+        db = LocalThreatDatabase(path=str(tmp_path / "db.json"))
+        await db.update()
+        monkeypatch.setattr(safebrowsing, "MODE", "update")
+        monkeypatch.setattr(safebrowsing, "local_db", db)
+
+        # Google is down: the URL gets through this time, but the verdict isn't remembered
+        stub.statuses["fullHashes"] = 500
+        assert await safebrowsing.find_phishing_links(["http://evil.example/raid"]) == set()
+        assert len(safebrowsing.verdict_cache) == 0
+        assert not db.negative_prefix_cache
+
+        # So the next message with it is checked again once Google is back
+        del stub.statuses["fullHashes"]
+        assert await safebrowsing.find_phishing_links(["http://evil.example/raid"]) == {"http://evil.example/raid"}
+        assert len(stub.requests["fullHashes"]) == 2
+
+    run_with_stub(test)
+
+
+def test_checksum_mismatch_resets_list(tmp_path):
+    async def test(stub):
+        stub.update_response["listUpdateResponses"][0]["checksum"]["sha256"] = base64.b64encode(b"\0" * 32).decode()
+        db = LocalThreatDatabase(path=str(tmp_path / "db.json"))
+        await db.update()
+        assert ("MALWARE", "ANY_PLATFORM", "URL") not in db.lists
+        assert len(db.lists) == len(safebrowsing.THREAT_TYPES) - 1
+
+    run_with_stub(test)
+
+
+def test_update_forever_survives_malformed_response(tmp_path):
+    async def test(stub):
+        stub.update_response = {"listUpdateResponses": [{"additions": []}]}  # no list key fields
+        db = LocalThreatDatabase(path=str(tmp_path / "db.json"))
+        task = asyncio.create_task(db.update_forever())
+        await asyncio.sleep(0.5)
+        try:
+            assert not task.done()
+            assert len(stub.requests["update"]) == 1
+            assert db.next_update_at > 0
+        finally:
+            task.cancel()
+
+    run_with_stub(test)
+
+
+def test_lookup_mode_batches_and_caches():
+    async def test(stub):
+        urls = ["http://evil.example/a", "http://fine.example/b", "http://FINE.example/b#frag"]
+        assert await safebrowsing.find_phishing_links(urls) == {"http://evil.example/a"}
+        # One request, with the two spellings of the same URL sent once
+        assert len(stub.requests["find"]) == 1
+        assert len(stub.requests["find"][0]["threatInfo"]["threatEntries"]) == 2
+
+        assert await safebrowsing.find_phishing_links(urls) == {"http://evil.example/a"}
+        assert len(stub.requests["find"]) == 1
+
+    run_with_stub(test)
+
+
+def test_concurrent_lookups_share_one_request():
+    async def test(stub):
+        results = await asyncio.gather(*[safebrowsing.is_phishing_link("http://evil.example/raid") for _ in range(10)])
+        assert all(results)
+        assert len(stub.requests["find"]) == 1
+
+    run_with_stub(test)
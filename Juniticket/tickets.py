@@ -5,7 +5,7 @@ import aiohttp
 import io
 import re
 import os
-from transcripting import export_ticket_to_html, cleanup_file, upload_transcript_to_r2
+from transcripting import export_ticket_to_html, upload_transcript_to_r2
 from datetime import datetime, timezone
 
 # ============================================================
@@ -143,18 +143,6 @@ async def log_ticket_open(
 
         await log_channel.send(embed=embed)
 
-async def get_ticket_participants(channel: discord.TextChannel) -> list[discord.User]:
-    participants: dict[int, discord.User] = {}
-
-    async for msg in channel.history(limit=None):
-        author = msg.author
-        if author.bot:
-            continue
-
-        participants[author.id] = author
-
-    return list(participants.values())
-
 async def dm_transcript_to_non_mod_participants(
     participants: list[discord.abc.User],
     guild: discord.Guild,
@@ -564,8 +552,6 @@ class ConfirmCloseView(ui.View):
         try:
             await interaction.followup.send("Closing ticket and generating transcript...", ephemeral=True)
 
-            participants = await get_ticket_participants(channel)
-
             meta = get_ticket_meta(channel)
             opener_id = meta["opener_id"]
             ticket_type = meta["ticket_type"]
@@ -579,9 +565,8 @@ class ConfirmCloseView(ui.View):
                     except Exception:
                         opened_by = None
 
-            transcript_path = None
-            transcript_path, slug = await export_ticket_to_html(channel)
-            transcript_url = await upload_transcript_to_r2(transcript_path, slug)
+            transcript, slug, participants = await export_ticket_to_html(channel)
+            transcript_url = await upload_transcript_to_r2(transcript, slug)
 
             await log_ticket_close(
                 guild=guild,
@@ -600,9 +585,6 @@ class ConfirmCloseView(ui.View):
                 transcript_url=transcript_url
             )
 
-            if transcript_path:
-                cleanup_file(transcript_path)
-
             await channel.delete(reason="Ticket closed")
 
         except Exception as e:
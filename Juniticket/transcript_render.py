@@ -0,0 +1,398 @@
+import html
+from datetime import datetime
+from functools import lru_cache
+from urllib.parse import quote
+
+# HTML renderer behind transcripting.py. The stylesheet and the fixed markup are built once at
+# import; each message is rendered as a list of fragments joined once, and the fields that repeat
+# across a transcript (author names, avatars) are escaped once and reused. Avatars are deduped
+# into a per-transcript stylesheet, see TranscriptRenderer.
+# Rows are encoded to UTF-8 as they are rendered: one emoji would otherwise make Python store the
+# whole joined page at 4 bytes per character.
+
+ESCAPE_CACHE_SIZE = 4096
+
+TRANSCRIPT_CSS = """:root{
+  --bg: #0f131a;
+  --bg2:#121826;
+  --text:#e6e6e6;
+  --muted:#9aa3b2;
+  --link:#4db5ff;
+  --line:#2a3140;
+  --bubble:#171f2d;
+  --embed:#1a2232;
+}
+*{box-sizing:border-box}
+body{
+  margin:0;
+  font-family: ui-sans-serif, system-ui, -apple-system, Segoe UI, Roboto, Arial, sans-serif;
+  background: #0f131a; /* solid Discord-like dark */
+  color:var(--text);
+}
+a{ color:var(--link); text-decoration:none }
+a:hover{ text-decoration:underline }
+
+.wrapper{
+  max-width: 1400px;
+  margin: 0 auto;
+  padding: 18px 24px 60px;
+}
+
+.header{
+  display:flex;
+  align-items:flex-start;
+  gap: 12px;
+  margin-bottom: 18px;
+}
+.gicon{
+  width: 34px; height: 34px;
+  border-radius: 10px;
+  background: #0b0f18;
+  border: 1px solid var(--line);
+  flex: 0 0 auto;
+}
+.htext .gname{
+  font-size: 22px;
+  font-weight: 800;
+  line-height: 1.1;
+}
+.htext .cname{
+  font-size: 18px;
+  margin-top: 2px;
+  color: var(--text);
+}
+.htext .count{
+  font-size: 18px;
+  margin-top: 2px;
+  color: var(--text);
+}
+
+.log{ margin-top: 12px; }
+
+.msg{
+  display:flex;
+  gap: 12px;
+  padding: 14px 0;
+}
+.avatar{
+  width: 44px; height: 44px;
+  border-radius: 50%;
+  border: 1px solid var(--line);
+  background: #0b0f18 center / cover no-repeat;
+  flex: 0 0 auto;
+}
+.main{ min-width:0; width:100%; }
+
+.topline{
+  display:flex;
+  align-items:baseline;
+  flex-wrap:wrap;
+  gap: 8px;
+}
+.name{
+  font-weight: 800;
+  font-size: 16px;
+}
+.badge{
+  font-size: 11px;
+  padding: 2px 6px;
+  border-radius: 6px;
+  background: #3b82f6;
+  color: #fff;
+  font-weight: 800;
+}
+.time{
+  font-size: 12px;
+  color: var(--muted);
+}
+
+.content{
+  margin-top: 4px;
+  font-size: 14px;
+  line-height: 1.35;
+  white-space: pre-wrap;
+  overflow-wrap:anywhere;
+}
+
+.replyWrap{
+  margin-top: 6px;
+  padding-left: 18px;
+  border-left: 2px solid var(--line);
+}
+.replyLine{
+  font-size: 12px;
+  color: var(--muted);
+  margin-bottom: 6px;
+  display:flex;
+  gap:6px;
+  align-items:center;
+}
+.replyDot{
+  width: 10px; height: 10px;
+  border-left: 2px solid var(--line);
+  border-bottom: 2px solid var(--line);
+  border-bottom-left-radius: 6px;
+  margin-left: -20px;
+}
+
+.embed{
+  margin-top: 8px;
+  background: rgba(255,255,255,0.04);
+  border: 1px solid var(--line);
+  border-left: 4px solid #ef4444; /* default-ish; we vary it if embed has color */
+  border-radius: 6px;
+  padding: 10px 12px;
+  max-width: 860px;
+}
+.embed .etitle{
+  font-weight: 800;
+  margin-bottom: 4px;
+}
+.embed .edesc{
+  color: var(--text);
+  font-size: 13px;
+  white-space: pre-wrap;
+}
+.attachments{
+  margin-top: 8px;
+  display:flex;
+  flex-direction:column;
+  gap: 8px;
+  max-width: 860px;
+}
+.file{
+  background: rgba(255,255,255,0.04);
+  border: 1px solid var(--line);
+  border-radius: 6px;
+  padding: 8px 10px;
+  font-size: 13px;
+  color: var(--muted);
+}
+.preview{
+  display:block;
+  max-width: 860px;
+  border-radius: 8px;
+  border: 1px solid var(--line);
+}
+"""
+
+DOCUMENT_HEAD = (
+    "<!doctype html><html><head><meta charset='utf-8'>\n"
+    "<meta name='viewport' content='width=device-width, initial-scale=1' />\n"
+)
+DOCUMENT_STYLE = "\n<style>\n" + TRANSCRIPT_CSS + "</style>\n"
+DOCUMENT_TAIL_BYTES = b"</div>\n</div>\n</body></html>"
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".gif")
+DEFAULT_EMBED_COLOR = "#ef4444"
+CSS_URL_SAFE = ":/?&=%#.,;~+-_@!*$[]"
+
+
+def fmt_dt(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%d %H:%M:%S UTC")
+
+
+def esc(s: str) -> str:
+    return html.escape(s or "")
+
+
+def is_image(filename: str) -> bool:
+    return (filename or "").lower().endswith(IMAGE_EXTENSIONS)
+
+
+@lru_cache(maxsize=ESCAPE_CACHE_SIZE)
+def esc_cached(s: str) -> str:
+    """esc() for values that repeat across messages, e.g. attachment URLs."""
+    return esc(s)
+
+
+def css_url(url: str) -> str:
+    """Quotes a URL for use inside url("...") in a <style> block, where HTML escaping doesn't apply."""
+    return quote(url, safe=CSS_URL_SAFE)
+
+
+class TranscriptRenderer:
+    """
+    Renders one transcript. Each distinct avatar is written once, as a CSS class in the page's
+    head, and message rows refer to it by class name instead of repeating the full URL.
+    attachment_urls maps Discord attachment URLs to replacements (e.g. copies mirrored to the bucket).
+    """
+
+    def __init__(self, attachment_urls: dict = None):
+        self.attachment_urls = attachment_urls if attachment_urls is not None else {}
+        self.avatar_classes = {}  # avatar url -> css class
+        self.author_fragments = {}  # (display name, avatar url, is bot) -> rendered row prefix
+
+    def avatar_class(self, url: str) -> str:
+        cls = self.avatar_classes.get(url)
+        if cls is None:
+            cls = f"av{len(self.avatar_classes)}"
+            self.avatar_classes[url] = cls
+        return cls
+
+    def author_fragment(self, display_name: str, avatar_url: str, is_bot: bool) -> str:
+        """Everything in a message row before the timestamp: avatar, name and BOT badge."""
+        key = (display_name, avatar_url, is_bot)
+        fragment = self.author_fragments.get(key)
+        if fragment is None:
+            avatar_cls = f" {self.avatar_class(avatar_url)}" if avatar_url else ""
+            badge = "<span class='badge'>BOT</span>\n" if is_bot else ""
+            fragment = (
+                f"<div class='msg'>\n<div class='avatar{avatar_cls}'></div>\n<div class='main'>\n<div class='topline'>\n"
+                f"<span class='name'>{esc(display_name)}</span>\n{badge}"
+            )
+            self.author_fragments[key] = fragment
+        return fragment
+
+    def render_message(self, m) -> bytes:
+        """Renders one discord.Message (or anything shaped like one) as a UTF-8 transcript row."""
+        author = m.author
+        display_avatar = getattr(author, "display_avatar", None)
+        parts = [
+            self.author_fragment(
+                getattr(author, "display_name", str(author)),
+                display_avatar.url if display_avatar else "",
+                bool(getattr(author, "bot", False)),
+            ),
+            f"<span class='time'>{esc(fmt_dt(m.created_at))}</span>\n</div>\n",
+        ]
+
+        content = esc(m.content)
+        content_html = f"<div class='content'>{content}</div>\n" if content.strip() else ""
+
+        # Reply: small "reply to message" line, with the content inside the indent bar
+        if m.reference and m.reference.message_id:
+            parts.append(
+                "<div class='replyWrap'>\n<div class='replyLine'>\n<span class='replyDot'></span>\n"
+                f"<span>reply to message ({m.reference.message_id})</span>\n</div>\n"
+            )
+            parts.append(content_html)
+            parts.append("</div>\n")
+        else:
+            parts.append(content_html)
+
+        for e in m.embeds:
+            etitle = esc(getattr(e, "title", "") or "")
+            edesc = esc(getattr(e, "description", "") or "")
+            if not (etitle or edesc):
+                continue
+            # Try to use embed color if present
+            left_color = DEFAULT_EMBED_COLOR
+            try:
+                if e.color and e.color.value:
+                    left_color = f"#{e.color.value:06x}"
+            except Exception:
+                pass
+
+            parts.append(f"<div class='embed' style='border-left-color:{left_color}'>\n")
+            if etitle:
+                parts.append(f"<div class='etitle'>{etitle}</div>\n")
+            if edesc:
+                parts.append(f"<div class='edesc'>{edesc}</div>\n")
+            parts.append("</div>\n")
+
+        if m.attachments:
+            parts.append("<div class='attachments'>\n")
+            for a in m.attachments:
+                url = esc_cached(self.attachment_urls.get(a.url, a.url))
+                name = esc(a.filename)
+                parts.append(f"<div class='file'>📎 <a href='{url}' target='_blank'>{name}</a></div>\n")
+                if is_image(a.filename):
+                    parts.append(f"<a href='{url}' target='_blank'><img class='preview' src='{url}' alt='{name}' /></a>\n")
+            parts.append("</div>\n")
+
+        parts.append("</div>\n</div>\n")
+        return "".join(parts).encode("utf-8")
+
+    def avatar_styles(self) -> str:
+        rules = [f'.{cls}{{background-image:url("{css_url(url)}")}}\n' for url, cls in self.avatar_classes.items()]
+        return "<style>\n" + "".join(rules) + "</style>\n" if rules else ""
+
+    def render_document(self, channel_name: str, guild_name: str, guild_icon_url: str, rows: list[bytes]) -> bytes:
+        """
+        Wraps rendered message rows in the page (head, stylesheets, guild/channel header) as UTF-8.
+        Call once every row has been rendered, so the avatar stylesheet covers all of them.
+        """
+        if guild_icon_url:
+            icon = f"<img class='gicon' src='{esc(guild_icon_url)}' alt='Guild icon' />\n"
+        else:
+            icon = "<div class='gicon'></div>\n"
+
+        channel_name = esc(channel_name)
+        header = (
+            f"<div class='wrapper'>\n<div class='header'>\n{icon}<div class='htext'>\n"
+            f"<div class='gname'>{esc(guild_name)}</div>\n"
+            f"<div class='cname'>{channel_name}</div>\n"
+            f"<div class='count'>{len(rows)} messages</div>\n"
+            "</div></div>\n<div class='log'>\n"
+        )
+        head = "".join([
+            DOCUMENT_HEAD,
+            f"<title>{channel_name} — Transcript</title>\n",
+            DOCUMENT_STYLE,
+            self.avatar_styles(),
+            "</head><body>\n",
+            header,
+        ])
+        return b"".join([head.encode("utf-8"), *rows, DOCUMENT_TAIL_BYTES])
+
+
+if __name__ == "__main__":
+    # Benchmark: python transcript_render.py
+    import random
+    import time
+    import tracemalloc
+    from datetime import timedelta
+    from types import SimpleNamespace
+
+    rng = random.Random(0)
+    authors = [
+        SimpleNamespace(
+            display_name=f"member{i} <3",
+            display_avatar=SimpleNamespace(url=f"https://cdn.discordapp.com/avatars/{i}/{'a' * 32}.png?size=1024"),
+            bot=i == 0,
+        )
+        for i in range(25)
+    ]
+    words = ["ticket", "help", "please", "thanks", "<b>", "&", "report", "appeal", "screenshot", "ok"]
+
+    def synthetic_channel(n):
+        start = datetime(2024, 1, 1)
+        messages = []
+        for i in range(n):
+            attachments = []
+            if rng.random() < 0.05:
+                attachments.append(SimpleNamespace(url=f"https://cdn.discordapp.com/attachments/{i}/image.png", filename="image.png"))
+            embeds = []
+            if rng.random() < 0.05:
+                embeds.append(SimpleNamespace(title="Ticket opened", description="A staff member will be with you shortly.", color=SimpleNamespace(value=0x5865F2)))
+            messages.append(SimpleNamespace(
+                author=rng.choice(authors),
+                content=" ".join(rng.choices(words, k=rng.randint(1, 40))),
+                created_at=start + timedelta(seconds=i * 7),
+                reference=SimpleNamespace(message_id=i - 1) if i and rng.random() < 0.1 else None,
+                embeds=embeds,
+                attachments=attachments,
+            ))
+        return messages
+
+    def render(messages):
+        renderer = TranscriptRenderer()
+        return renderer.render_document("ticket-0001", "Junimo", "", [renderer.render_message(m) for m in messages])
+
+    for n in (1000, 10000, 50000):
+        messages = synthetic_channel(n)
+
+        start = time.perf_counter()
+        data = render(messages)
+        elapsed = time.perf_counter() - start
+
+        tracemalloc.start()
+        render(messages)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print(
+            f"{n:>6} messages: {elapsed * 1000:8.1f} ms | {n / elapsed:10,.0f} msg/s | "
+            f"output {len(data) / 1e6:6.2f} MB | peak {peak / 1e6:6.2f} MB"
+        )